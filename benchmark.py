@@ -0,0 +1,213 @@
+from pocket_cube.cube import Cube, Move
+from pocket_cube.metrics import Metric, METRICS, QTM
+from pocket_cube.sampling import sample
+from pocket_cube.sequence import verify_solutions
+from heuristics import manhattan, distance_heuristic
+from solvers import Solver, a_star, bidirectional_bfs, ida_star, solve_by_table, release_node_stores
+from mcts import play_mcts
+from stats import SearchStats
+from dataclasses import dataclass, asdict, field, fields
+from functools import partial
+import argparse
+import csv
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# solvers that can be benchmarked by name, which also take an optional SearchStats and the metric
+SOLVERS: dict[str, Solver] = {
+    "a_star_manhattan": lambda cube, stats=None, metric=QTM: a_star(cube, manhattan, stats, metric),
+    "bidirectional_bfs": bidirectional_bfs,
+    "ida_star_distance": lambda cube, stats=None, metric=QTM: ida_star(
+        cube, distance_heuristic if metric is QTM else partial(distance_heuristic, metric=metric), stats, metric),
+    "ida_star_manhattan": lambda cube, stats=None, metric=QTM: ida_star(cube, manhattan, stats, metric),
+    "mcts_manhattan": lambda cube, stats=None, metric=QTM: play_mcts(cube, 5000, 0.5, manhattan, stats, metric),
+    "move_table": lambda cube, stats=None, metric=QTM: solve_by_table(cube, metric),
+}
+
+@dataclass
+class BenchmarkRow:
+    solver: str
+    depth: int
+    scrambles: int
+    repetitions: int
+    solved: float
+    median_ns: int
+    p95_ns: int
+    mean_states: float
+    mean_path_length: float
+    peak_bytes: int
+    # mean SearchStats counters and timings per scramble, measured on separate runs
+    stats: dict[str, float] = field(default_factory=dict)
+
+def build_corpus(depths: list[int], per_depth: int, seed: int, metric: Metric = QTM) -> dict[int, np.ndarray]:
+    """
+    Draws, for each depth, uniformly random states (with replacement) whose optimal solution has exactly that length.
+
+    Args:
+        depths (list[int]): The optimal depths.
+        per_depth (int): The number of states per depth.
+        seed (int): The seed, the same seed always gives the same corpus.
+        metric (Metric, optional): The metric of the depths. Defaults to QTM.
+
+    Returns:
+        dict[int, np.ndarray]: The (per_depth, 24) states of each depth.
+    """
+    rng = np.random.default_rng(seed)
+    return {depth: sample(per_depth, rng, depth, dtype=np.int64, metric=metric) for depth in depths}
+
+def benchmark(solver: Solver, name: str, depth: int, states: np.ndarray, repetitions: int, warmup: int,
+              collect_stats: bool = False) -> BenchmarkRow:
+    """
+    Times the solver on each state, repetitions times after warmup untimed runs.
+    The peak memory is measured on a separate run per state, as tracing allocations slows the solver down,
+    and so are the search stats if collect_stats is set. The node stores that the solvers keep between searches
+    are released before each of these runs, so the peak includes the stores the search allocates.
+
+    Returns:
+        BenchmarkRow: The aggregated measurements.
+    """
+    for state in states[:warmup]:
+        solver(Cube.from_state(state.copy()))
+
+    times: list[int] = []
+    expanded: list[int] = []
+    solutions: list[list[Move]] = []
+    for state in states:
+        for _ in range(repetitions):
+            cube = Cube.from_state(state.copy())
+            start = time.perf_counter_ns()
+            (path, states_expanded) = solver(cube)
+            times.append(time.perf_counter_ns() - start)
+        expanded.append(states_expanded)
+        solutions.append(path)
+
+    peak: int = 0
+    for state in states:
+        release_node_stores()
+        tracemalloc.start()
+        solver(Cube.from_state(state.copy()))
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    stats: SearchStats = SearchStats()
+    if collect_stats:
+        for state in states:
+            solver(Cube.from_state(state.copy()), stats=stats)
+
+    return BenchmarkRow(
+        solver=name,
+        depth=depth,
+        scrambles=len(states),
+        repetitions=repetitions,
+        solved=float(verify_solutions(states, solutions).mean()),
+        median_ns=int(np.median(times)),
+        p95_ns=int(np.percentile(times, 95)),
+        mean_states=float(np.mean(expanded)),
+        mean_path_length=float(np.mean([len(path) for path in solutions])),
+        peak_bytes=peak,
+        stats={key: value / len(states) for (key, value) in stats.as_dict().items()} if collect_stats else {},
+    )
+
+def run(solvers: list[str], depths: list[int], per_depth: int, repetitions: int, warmup: int, seed: int,
+        log: bool = True, collect_stats: bool = False, metric: Metric = QTM) -> list[BenchmarkRow]:
+    corpus: dict[int, np.ndarray] = build_corpus(depths, per_depth, seed, metric)
+    rows: list[BenchmarkRow] = []
+    for name in solvers:
+        solver: Solver = SOLVERS[name] if metric is QTM else partial(SOLVERS[name], metric=metric)
+        for depth in depths:
+            row = benchmark(solver, name, depth, corpus[depth], repetitions, warmup, collect_stats)
+            if log:
+                print(f"{name} depth {depth}: median {row.median_ns / 1e6:.3f} ms, p95 {row.p95_ns / 1e6:.3f} ms, "
+                      f"states {row.mean_states:.0f}, peak {row.peak_bytes / 1024:.0f} KiB, solved {row.solved:.0%}")
+            rows.append(row)
+    return rows
+
+def write_json(path: str, rows: list[BenchmarkRow], config: dict):
+    report = {
+        "config": config,
+        "environment": {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform()},
+        "results": [asdict(row) for row in rows],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+def write_csv(path: str, rows: list[BenchmarkRow]):
+    # the stats are flattened into one "stats.<name>" column each
+    columns: list[str] = [column.name for column in fields(BenchmarkRow) if column.name != "stats"]
+    stats_columns: list[str] = list(dict.fromkeys(key for row in rows for key in row.stats))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns + [f"stats.{key}" for key in stats_columns])
+        writer.writeheader()
+        for row in rows:
+            record = asdict(row)
+            record.update((f"stats.{key}", value) for (key, value) in record.pop("stats").items())
+            writer.writerow(record)
+
+def compare(rows: list[BenchmarkRow], baseline_path: str, threshold: float, log: bool = True) -> list[str]:
+    """
+    Compares the median times against a JSON report written by a previous run.
+
+    Args:
+        rows (list[BenchmarkRow]): The current results.
+        baseline_path (str): The baseline report.
+        threshold (float): The allowed slowdown, 0.1 allows medians up to 10% slower.
+
+    Returns:
+        list[str]: A description of every regression, empty if there is none.
+    """
+    with open(baseline_path) as f:
+        baseline = {(row["solver"], row["depth"]): row for row in json.load(f)["results"]}
+
+    regressions: list[str] = []
+    for row in rows:
+        base = baseline.get((row.solver, row.depth))
+        if base is None:
+            continue
+        ratio: float = row.median_ns / max(base["median_ns"], 1)
+        if log:
+            print(f"{row.solver} depth {row.depth}: {ratio:.2f}x baseline")
+        if ratio > 1 + threshold:
+            regressions.append(f"{row.solver} depth {row.depth} is {ratio:.2f}x slower than the baseline")
+    return regressions
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the solvers on seeded scrambles binned by optimal depth.")
+    parser.add_argument("--solvers", nargs="+", default=["bidirectional_bfs", "ida_star_distance"], choices=list(SOLVERS))
+    parser.add_argument("--metric", default="qtm", choices=list(METRICS), help="moves of the solutions and metric of the depths")
+    parser.add_argument("--depths", nargs="+", type=int, default=None, help="defaults to 1 to God's number of the metric")
+    parser.add_argument("--per-depth", type=int, default=10, help="scrambles per depth")
+    parser.add_argument("--repetitions", type=int, default=5, help="timed runs per scramble")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs before timing each depth")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stats", action="store_true", help="collect the search counters and phase timings")
+    parser.add_argument("--json", help="write the report to this JSON file")
+    parser.add_argument("--csv", help="write the results to this CSV file")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+    metric: Metric = METRICS[args.metric]
+    if args.depths is None:
+        args.depths = list(range(1, metric.gods_number + 1))
+
+    rows = run(args.solvers, args.depths, args.per_depth, args.repetitions, args.warmup, args.seed,
+               collect_stats=args.stats, metric=metric)
+    config = {key: value for key, value in vars(args).items() if key not in ("json", "csv", "baseline")}
+    if args.json:
+        write_json(args.json, rows, config)
+    if args.csv:
+        write_csv(args.csv, rows)
+
+    if args.baseline:
+        regressions = compare(rows, args.baseline, args.threshold)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
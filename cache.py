@@ -0,0 +1,147 @@
+from pocket_cube.cube import Cube, Move
+from pocket_cube.moves import MOVE_LIST
+from pocket_cube.metrics import Metric, QTM
+from pocket_cube.tables import transition_table, write_atomic
+from pocket_cube.symmetry import canonicalize, apply_symmetry, map_solution
+from solvers import Solver
+from collections import OrderedDict
+import os
+import sys
+import numpy as np
+
+SOLVED_KEY: int = Cube(scrambled=False).encode()
+
+# approximate size of an entry besides its moves: the rank, the bytes object and the ordered dict slot
+ENTRY_OVERHEAD: int = sys.getsizeof(2 ** 21) + sys.getsizeof(b"") + 100
+
+class SolutionCache:
+    """
+    Wraps a solver with a least recently used cache of its solutions, keyed by Cube.encode().
+    With canonical=True the key is the representative of the symmetry class of the state instead,
+    so the 48 symmetric versions of a scramble share one entry, at the cost of a canonicalize per call.
+
+    A cached solution is stored as the bytes of its Move values. The cache is called like the solver,
+    a hit returning the cached solution with 0 states. An empty solution of an unsolved state,
+    which is how a solver such as play_mcts reports running out of budget, is not cached.
+    """
+
+    def __init__(self, solver: Solver, max_entries: int | None = None, max_bytes: int | None = None,
+                 path: str | None = None, canonical: bool = False, cache_suffixes: bool = False, metric: Metric = QTM):
+        """
+        Args:
+            solver (Solver): The solver to cache.
+            max_entries (int | None, optional): The maximum number of solutions. Defaults to no limit.
+            max_bytes (int | None, optional): The maximum approximate size of the solutions. Defaults to no limit.
+            path (str | None, optional): The file that load and save use, loaded now if it exists. Defaults to None.
+            canonical (bool, optional): Whether to key by the symmetry class. Defaults to False.
+            cache_suffixes (bool, optional): Whether to also cache every state met along a new solution,
+                with the rest of the solution. Only supported with canonical=False. Defaults to False.
+            metric (Metric, optional): The metric of the solver, whose moves the suffixes follow. Defaults to QTM.
+        """
+        if canonical and cache_suffixes:
+            raise ValueError("cache_suffixes is not supported with canonical keys")
+
+        self.solver = solver
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.canonical = canonical
+        self.cache_suffixes = cache_suffixes
+        self.metric = metric
+        self.entries: OrderedDict[int, bytes] = OrderedDict()
+        self.bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __call__(self, cube: Cube) -> tuple[list[Move], int]:
+        if self.canonical:
+            (key, transform) = canonicalize(cube.state)
+        else:
+            key = cube.encode()
+
+        moves: bytes | None = self.entries.get(key)
+        if moves is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            path = [MOVE_LIST[move] for move in moves]
+            return (map_solution(path, transform) if self.canonical else path, 0)
+
+        self.misses += 1
+        if self.canonical:
+            (path, states) = self.solver(Cube.from_state(apply_symmetry(cube.state, transform)))
+            if path or key == SOLVED_KEY:
+                self.put(key, path)
+            return (map_solution(path, transform), states)
+
+        (path, states) = self.solver(cube)
+        if self.cache_suffixes:
+            # the suffixes go in first, so that the scramble itself is the most recently used
+            transitions: np.ndarray = transition_table(metric=self.metric)
+            state: int = key
+            for i in range(len(path) - 1):
+                state = int(transitions[state, path[i].value])
+                if state not in self.entries:
+                    self.put(state, path[i + 1:])
+        if path or key == SOLVED_KEY:
+            self.put(key, path)
+        return (path, states)
+
+    def put(self, key: int, path: list[Move]):
+        """
+        Caches the solution of the state with the given key, evicting the least recently used solutions if full.
+        """
+        self._insert(key, bytes(move.value for move in path))
+
+    def _insert(self, key: int, moves: bytes):
+        old: bytes | None = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old) + ENTRY_OVERHEAD
+        self.entries[key] = moves
+        self.bytes += len(moves) + ENTRY_OVERHEAD
+
+        while self.entries and ((self.max_entries is not None and len(self.entries) > self.max_entries) or
+                                (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= len(evicted) + ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, cube: Cube) -> bool:
+        return (canonicalize(cube.state)[0] if self.canonical else cube.encode()) in self.entries
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self.entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+    def save(self, path: str | None = None):
+        """
+        Writes the cached solutions, from least to most recently used, to a .npz file,
+        with write_atomic so that a crash never leaves a partial cache.
+        """
+        path = path or self.path
+        keys: np.ndarray = np.fromiter(self.entries.keys(), dtype=np.int32, count=len(self.entries))
+        lengths: np.ndarray = np.fromiter(map(len, self.entries.values()), dtype=np.uint8, count=len(self.entries))
+        moves: np.ndarray = np.frombuffer(b"".join(self.entries.values()), dtype=np.uint8)
+        write_atomic(path, lambda f: np.savez(f, keys=keys, lengths=lengths, moves=moves, canonical=self.canonical))
+
+    def load(self, path: str | None = None):
+        """
+        Adds the solutions saved by save, as the most recently used ones.
+        """
+        with np.load(path or self.path) as data:
+            if bool(data["canonical"]) != self.canonical:
+                raise ValueError(f"the cache file is keyed {'canonically' if data['canonical'] else 'by rank'}")
+            moves: bytes = data["moves"].tobytes()
+            offsets: list[int] = np.concatenate([[0], np.cumsum(data["lengths"], dtype=np.int64)]).tolist()
+            for (i, key) in enumerate(data["keys"].tolist()):
+                self._insert(key, moves[offsets[i]:offsets[i + 1]])
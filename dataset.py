@@ -0,0 +1,167 @@
+from pocket_cube.cube import Cube
+from pocket_cube.constants import NUM_STATES
+from pocket_cube.metrics import Metric, METRICS, QTM
+from pocket_cube.tables import distance_table, move_table, optimal_moves, write_atomic
+from pocket_cube.sampling import sample_ranks
+from typing import Iterator
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+"""
+Streaming export of (state, optimal distance, optimal move) training records.
+
+The records are written as .npy shards of a structured dtype, which np.load can memory-map,
+with a manifest.json listing them. Every record is read from the distance and move tables,
+so nothing is solved, and the records are produced one chunk at a time, so the memory used
+does not depend on the number of records. The distances and the moves are those of one metric,
+recorded in the manifest.
+"""
+
+MANIFEST_FILE = "manifest.json"
+
+# rank is Cube.encode(), move the Move.value of an optimal move (Metric.no_move for the solved state)
+RECORD_DTYPE = np.dtype([("rank", "<i4"), ("distance", "u1"), ("move", "u1")])
+# the same, with the stickers of the state
+STICKER_RECORD_DTYPE = np.dtype(RECORD_DTYPE.descr + [("state", "u1", (24,))])
+
+ORDERS = ("rank", "layers", "uniform")
+
+def _ranks(order: str, count: int | None, chunk: int, rng: np.random.Generator, metric: Metric) -> Iterator[np.ndarray]:
+    distances: np.ndarray = distance_table(metric=metric)
+    if order == "rank":
+        for start in range(0, NUM_STATES, chunk):
+            yield np.arange(start, min(start + chunk, NUM_STATES), dtype=np.int32)
+    elif order == "layers":
+        # one scan of the table per depth, so only a chunk of ranks is ever held
+        for depth in range(metric.gods_number + 1):
+            for start in range(0, NUM_STATES, chunk):
+                yield (start + np.flatnonzero(distances[start:start + chunk] == depth)).astype(np.int32)
+    elif order == "uniform":
+        for start in range(0, count, chunk):
+            yield sample_ranks(min(chunk, count - start), rng)
+    else:
+        raise ValueError(f"Invalid order {order}, expected one of {ORDERS}")
+
+def iter_records(order: str = "rank", count: int | None = None, stickers: bool = False, chunk: int = 1 << 16,
+                 rng: np.random.Generator | None = None, metric: Metric = QTM) -> Iterator[np.ndarray]:
+    """
+    Yields the records in chunks of at most chunk records.
+
+    Args:
+        order (str, optional): "rank" for every state by rank, "layers" for every state by distance
+            (breadth-first order), or "uniform" for count states drawn uniformly with replacement. Defaults to "rank".
+        count (int | None, optional): The number of records, required by "uniform". Defaults to every state.
+        stickers (bool, optional): Whether to add the stickers of the state to the records. Defaults to False.
+        chunk (int, optional): The maximum number of records per chunk. Defaults to 65536.
+        rng (np.random.Generator | None, optional): The random generator of "uniform". Defaults to a fresh one.
+        metric (Metric, optional): The metric of the distances and the moves. Defaults to QTM.
+
+    Returns:
+        Iterator[np.ndarray]: The structured arrays of RECORD_DTYPE, or STICKER_RECORD_DTYPE with stickers.
+    """
+    if order == "uniform" and count is None:
+        raise ValueError("the uniform order needs a count")
+    distances: np.ndarray = distance_table(metric=metric)
+    moves: np.ndarray = move_table(metric=metric)
+    rng = rng or np.random.default_rng()
+    remaining: int = NUM_STATES if count is None else count
+
+    for ranks in _ranks(order, count, chunk, rng, metric):
+        ranks = ranks[:remaining]
+        if not len(ranks):
+            continue
+        records = np.empty(len(ranks), dtype=STICKER_RECORD_DTYPE if stickers else RECORD_DTYPE)
+        records["rank"] = ranks
+        records["distance"] = distances[ranks]
+        records["move"] = optimal_moves(ranks, moves, metric)
+        if stickers:
+            records["state"] = Cube.decode_states(ranks)
+        yield records
+        remaining -= len(ranks)
+        if not remaining:
+            return
+
+def export(out_dir: str, order: str = "rank", count: int | None = None, stickers: bool = False,
+           shard_size: int = 1 << 20, seed: int | None = None, log: bool = True, metric: Metric = QTM) -> dict:
+    """
+    Writes the records as shards of shard_size records (the last one possibly smaller) and a manifest.
+
+    Args:
+        out_dir (str): The output directory.
+        order, count, stickers, metric: As in iter_records.
+        shard_size (int, optional): The number of records per shard. Defaults to 1048576.
+        seed (int | None, optional): The seed of the uniform order. Defaults to None.
+
+    Returns:
+        dict: The manifest.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    dtype: np.dtype = STICKER_RECORD_DTYPE if stickers else RECORD_DTYPE
+    shards: list[dict] = []
+    buffer: np.ndarray = np.empty(shard_size, dtype=dtype)
+    filled: int = 0
+    start: float = time.perf_counter()
+
+    def flush():
+        name = f"shard-{len(shards):05d}.npy"
+        write_atomic(os.path.join(out_dir, name), lambda f: np.save(f, buffer[:filled]))
+        shards.append({"file": name, "records": filled})
+        if log:
+            print(f"{name}: {filled} records", file=sys.stderr)
+
+    # chunks never straddle a shard, so the buffer is the only copy of the records
+    for records in iter_records(order, count, stickers, min(shard_size, 1 << 16), np.random.default_rng(seed), metric):
+        while len(records):
+            taken = records[:shard_size - filled]
+            buffer[filled:filled + len(taken)] = taken
+            filled += len(taken)
+            records = records[len(taken):]
+            if filled == shard_size:
+                flush()
+                filled = 0
+    if filled:
+        flush()
+
+    manifest = {
+        "order": order,
+        "seed": seed,
+        "metric": metric.name,
+        "no_move": metric.no_move,
+        "records": sum(shard["records"] for shard in shards),
+        "fields": {name: str(dtype.fields[name][0]) for name in dtype.names},
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    if log:
+        print(f"{manifest['records']} records in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return manifest
+
+def load_shards(out_dir: str) -> list[np.ndarray]:
+    """
+    Returns the shards listed in the manifest, memory-mapped read-only.
+    """
+    with open(os.path.join(out_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    return [np.load(os.path.join(out_dir, shard["file"]), mmap_mode="r") for shard in manifest["shards"]]
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export (state, optimal distance, optimal move) records as .npy shards.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--order", default="rank", choices=ORDERS)
+    parser.add_argument("--count", type=int, default=None, help="records to write, defaults to every state")
+    parser.add_argument("--stickers", action="store_true", help="add the 24 stickers of each state")
+    parser.add_argument("--shard-size", type=int, default=1 << 20, help="records per shard")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--metric", default="qtm", choices=list(METRICS), help="metric of the distances and the moves")
+    args = parser.parse_args(argv)
+
+    export(args.out_dir, args.order, args.count, args.stickers, args.shard_size, args.seed, metric=METRICS[args.metric])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
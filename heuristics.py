@@ -1,13 +1,29 @@
 from pocket_cube.cube import Cube
 from pocket_cube.cube import Move
-from utils import get_neighbors
+from pocket_cube.constants import NUM_STATES
+from pocket_cube.metrics import Metric, QTM, MOVE_PERMS
+from pocket_cube.tables import distance_table, transition_table, UNKNOWN
 from tests import test_list
+from dataclasses import dataclass
+from copy import copy
 import numpy as np
 from typing import Callable
+from operator import getitem
 
 # neighbours of a certain square considering rotations as moves
 square_neighbours = [[1,3,4,5], [0,2,4,5], [1,4,3,5], [0,2,4,5], [0,1,2,3], [0,1,2,3]]
 
+# lookup tables indexed by [position, colour]
+POSITIONS = np.arange(24)
+# 1 if the colour does not belong on the face of the position
+MISPLACED = (np.arange(6)[None, :] != POSITIONS[:, None] // 4).astype(np.int64)
+# distance from the face of the position to the face of the colour: 0, 1 if adjacent, 2 if opposite
+FACE_DISTANCE = np.array([[0 if color == face else 1 if color in square_neighbours[face] else 2
+                           for color in range(6)] for face in POSITIONS // 4])
+# list copies for the scalar heuristics, indexing Python lists is cheaper than NumPy on 24 items
+_MISPLACED_ROWS: list[list[int]] = MISPLACED.tolist()
+_FACE_DISTANCE_ROWS: list[list[int]] = FACE_DISTANCE.tolist()
+
 def is_admissible(astar: Callable[[Cube], tuple[list[Move], int]],
                  bfs: Callable[[Cube], tuple[list[Move], int]],
                  heuristic: Callable[[Cube], int]) -> bool:
@@ -20,6 +36,87 @@ def is_admissible(astar: Callable[[Cube], tuple[list[Move], int]],
                 return False
     return True
 
+@dataclass
+class HeuristicAudit:
+    # number of states, all of them
+    states: int
+    # largest h(state) - distance(state), positive if the heuristic overestimates somewhere
+    max_overestimate: float
+    # states where h(state) > distance(state)
+    inadmissible: int
+    # (state, move) edges where h(state) > 1 + h(neighbor)
+    inconsistent_edges: int
+    # largest h(state) - h(neighbor) over all edges, at most 1 for a consistent heuristic
+    max_edge_drop: float
+    # the distinct values of h, and the (gods_number + 1, len(h_values)) counts of states by [distance, h]
+    h_values: np.ndarray
+    histogram: np.ndarray
+
+    @property
+    def inadmissible_fraction(self) -> float:
+        return self.inadmissible / self.states
+
+    @property
+    def admissible(self) -> bool:
+        return self.inadmissible == 0
+
+    @property
+    def consistent(self) -> bool:
+        return self.inconsistent_edges == 0
+
+def audit_heuristic(heuristic_batch: Callable[[np.ndarray], np.ndarray], chunk: int = 1 << 18,
+                    log: bool = True, metric: Metric = QTM) -> HeuristicAudit:
+    """
+    Evaluates a batch heuristic on every state and checks it against the exact distances in the metric.
+    A heuristic is admissible if it never exceeds the distance, and consistent if it never drops by more than
+    the cost of a move, 1, along any edge of any state.
+
+    Args:
+        heuristic_batch (Callable[[np.ndarray], np.ndarray]): The batch heuristic, such as manhattan_batch.
+        chunk (int, optional): The number of states decoded and evaluated at once. Defaults to 262144.
+        log (bool, optional): Whether to print the summary. Defaults to True.
+        metric (Metric, optional): The metric of the distances and the edges. Defaults to QTM.
+
+    Returns:
+        HeuristicAudit: The results.
+    """
+    distances: np.ndarray = distance_table(metric=metric)
+    transitions: np.ndarray = transition_table(metric=metric)
+
+    h: np.ndarray = np.empty(NUM_STATES, dtype=np.float64)
+    for start in range(0, NUM_STATES, chunk):
+        h[start:start + chunk] = heuristic_batch(Cube.decode_states(np.arange(start, min(start + chunk, NUM_STATES))))
+
+    overestimates: np.ndarray = h - distances
+    inconsistent_edges: int = 0
+    max_edge_drop: float = -np.inf
+    for start in range(0, NUM_STATES, chunk):
+        drops = h[start:start + chunk, None] - h[transitions[start:start + chunk]]
+        inconsistent_edges += int((drops > 1).sum())
+        max_edge_drop = max(max_edge_drop, float(drops.max()))
+
+    (h_values, h_index) = np.unique(h, return_inverse=True)
+    histogram: np.ndarray = np.bincount(distances.astype(np.intp) * len(h_values) + h_index,
+                                        minlength=(int(distances.max()) + 1) * len(h_values)).reshape(-1, len(h_values))
+
+    audit = HeuristicAudit(
+        states=NUM_STATES,
+        max_overestimate=float(overestimates.max()),
+        inadmissible=int((overestimates > 0).sum()),
+        inconsistent_edges=inconsistent_edges,
+        max_edge_drop=max_edge_drop,
+        h_values=h_values,
+        histogram=histogram,
+    )
+    if log:
+        name: str = getattr(heuristic_batch, "__name__", "heuristic")
+        print(f"{name} ({metric.name}): {'admissible' if audit.admissible else 'not admissible'}, "
+              f"{'consistent' if audit.consistent else 'not consistent'}. "
+              f"Max overestimate: {audit.max_overestimate:g}, inadmissible states: {audit.inadmissible} "
+              f"({audit.inadmissible_fraction:.2%}), inconsistent edges: {audit.inconsistent_edges}, "
+              f"max drop along an edge: {audit.max_edge_drop:g}")
+    return audit
+
 def hamming(cube: Cube) -> int:
     """
     Returns the number of pieces that are not in the correct position.
@@ -31,7 +128,19 @@ def hamming(cube: Cube) -> int:
     Returns:
         int: The number of pieces that are not in the correct position.
     """
-    return np.sum(cube.state != cube.goal_state)
+    return sum(map(getitem, _MISPLACED_ROWS, cube.state.tolist()))
+
+def hamming_batch(states: np.ndarray) -> np.ndarray:
+    """
+    Batch version of hamming.
+
+    Args:
+        states (np.ndarray): The (N, 24) sticker arrays to evaluate.
+
+    Returns:
+        np.ndarray: The (N,) heuristic values.
+    """
+    return MISPLACED[POSITIONS, states].sum(axis=1)
 
 
 def blocked_hamming(cube: Cube) -> int:
@@ -44,37 +153,26 @@ def blocked_hamming(cube: Cube) -> int:
     Returns:
         int: The number of faces that are not in the correct position, multiplied by 4.
     """
-    res: int = 0
-    for i in range(6):
-        for j in range(4):
-            if cube.state[i * 4 + j] != cube.goal_state[i * 4 + j]:
-                res += 1
-                break
-    return res * 4
+    misplaced = iter(map(getitem, _MISPLACED_ROWS, cube.state.tolist()))
+    # zip the same iterator 4 times to walk the stickers face by face
+    return 4 * sum(map(any, zip(misplaced, misplaced, misplaced, misplaced)))
 
-def __distance_to_correct_face(cube: Cube, square: int):
+def blocked_hamming_batch(states: np.ndarray) -> np.ndarray:
     """
-    Returns the distance from a square to the correct face.
+    Batch version of blocked_hamming.
 
     Args:
-        cube (Cube): The cube to evaluate.
-        square (int): The square to evaluate.
+        states (np.ndarray): The (N, 24) sticker arrays to evaluate.
 
     Returns:
-        int: The distance from a square to the correct face.
-    """
-    color: int = cube.state[square]
-    face: int = square // 4
-    if color == face:
-        return 0
-    elif color in square_neighbours[face]:
-        return 1
-    else:
-        return 2
+        np.ndarray: The (N,) heuristic values.
+    """
+    return MISPLACED[POSITIONS, states].reshape(-1, 6, 4).any(axis=2).sum(axis=1) * 4
 
 def manhattan(cube: Cube) -> int:
     """
     Returns the sum of the distances from each square to the correct face.
+    A half turn can lower it by 2, so it overestimates a few distances in HTM (see audit_heuristic).
 
     Args:
         cube (Cube): The cube to evaluate.
@@ -82,46 +180,141 @@ def manhattan(cube: Cube) -> int:
     Returns:
         int: The sum of the distances from each square to the correct face.
     """
-    max_distance: int = 0
-    for face in range(6):
-        for i in range(4):
-            max_distance += __distance_to_correct_face(cube, face * 4 + i)
-    return max_distance / 8
+    return sum(map(getitem, _FACE_DISTANCE_ROWS, cube.state.tolist())) / 8
 
-def build_database(max_depth: int = 7) -> dict[str, int]:
+def manhattan_batch(states: np.ndarray) -> np.ndarray:
     """
-    Builds a database of the distance to the solved state for each state with a depth lower than max_depth.
+    Batch version of manhattan.
 
     Args:
-        max_depth (int, optional): The maximum depth to search. Defaults to 7.
+        states (np.ndarray): The (N, 24) sticker arrays to evaluate.
 
     Returns:
-        dict[str, int]: The database.
-    """
-    database: dict[str, int] = {}
-    cube = Cube()
-    cube.state = cube.goal_state
-    frontier: list[tuple[Cube, int]] = [(cube, 0)]
-    while frontier:
-        (cube, depth) = frontier.pop()
-        if cube.hash() not in database or database[cube.hash()] > depth:
-            database[cube.hash()] = depth
-            if depth < max_depth:
-                for (neighbor, _) in get_neighbors(cube):
-                    frontier.append((neighbor, depth + 1))
+        np.ndarray: The (N,) heuristic values.
+    """
+    return FACE_DISTANCE[POSITIONS, states].sum(axis=1) / 8
+
+# positions that each move changes, and the position each of their new stickers comes from (child = state[MOVE_PERMS[move]])
+_AFFECTED: list[list[int]] = [np.flatnonzero(perm != POSITIONS).tolist() for perm in MOVE_PERMS]
+_SOURCES: list[list[int]] = [perm[affected].tolist() for (perm, affected) in zip(MOVE_PERMS, _AFFECTED)]
+
+class IncrementalHeuristic:
+    """
+    Heuristic that is a function of per-sticker costs, table[position][colour], evaluated incrementally:
+    the partial value of a child is the partial value of its parent updated on the 12 stickers the move changes.
+    The partial value is the sum of the costs, or with per_face, the list of the sums of each face.
+    States are given as lists or tuples, which are cheaper than NumPy arrays to index one sticker at a time.
+
+    The solvers use it in place of the plain heuristic when incremental(heuristic) finds one.
+    """
+
+    def __init__(self, table: list[list[int]], value: Callable, per_face: bool = False):
+        self.table = table
+        self.per_face = per_face
+        self.value = value
+        # the stickers of the turned face only move among themselves, which changes nothing
+        # if the stickers of the face share the same costs
+        uniform_faces: set[int] = {face for face in range(6) if all(row == table[face * 4] for row in table[face * 4:face * 4 + 4])}
+        # (face, cost row of the position, position the new sticker comes from, position) of each changed sticker
+        self._changes: list[list[tuple[int, list[int], int, int]]] = [
+            [(position // 4, table[position], source, position) for (position, source) in zip(affected, sources)
+             if not (source // 4 == position // 4 and position // 4 in uniform_faces)]
+            for (affected, sources) in zip(_AFFECTED, _SOURCES)]
+
+    def partial(self, state: list[int] | tuple[int, ...]) -> int | list[int]:
+        """
+        Returns the partial value of the stickers.
+        """
+        costs: list[int] = list(map(getitem, self.table, state))
+        if self.per_face:
+            return [sum(costs[face * 4:face * 4 + 4]) for face in range(6)]
+        return sum(costs)
+
+    def child(self, partial: int | list[int], state: list[int] | tuple[int, ...], move: int) -> int | list[int]:
+        """
+        Returns the partial value of the state turned by the move value, given the partial value and the stickers of the state.
+        """
+        if self.per_face:
+            faces: list[int] = partial.copy()
+            for (face, row, source, position) in self._changes[move]:
+                faces[face] += row[state[source]] - row[state[position]]
+            return faces
+        return partial + sum([row[state[source]] - row[state[position]] for (_, row, source, position) in self._changes[move]])
+
+    def timed(self, stats) -> "IncrementalHeuristic":
+        """
+        Returns a copy whose child updates are timed and counted as heuristic calls by the SearchStats, if any.
+        """
+        if stats is None:
+            return self
+        clone = copy(self)
+        clone.child = stats.timed("heuristic", self.child)
+        return clone
+
+    def __call__(self, cube: Cube):
+        return self.value(self.partial(cube.state.tolist()))
+
+# incremental versions of the heuristics above, computing the same values
+INCREMENTAL: dict[Callable[[Cube], int], IncrementalHeuristic] = {
+    hamming: IncrementalHeuristic(_MISPLACED_ROWS, lambda total: total),
+    blocked_hamming: IncrementalHeuristic(_MISPLACED_ROWS, lambda faces: 4 * sum(map(bool, faces)), per_face=True),
+    manhattan: IncrementalHeuristic(_FACE_DISTANCE_ROWS, lambda total: total / 8),
+}
+
+def incremental(heuristic: Callable[[Cube], int]) -> IncrementalHeuristic | None:
+    """
+    Returns the incremental version of the heuristic, or None if it has none.
+    """
+    if isinstance(heuristic, IncrementalHeuristic):
+        return heuristic
+    return INCREMENTAL.get(heuristic)
+
+def build_database(max_depth: int | None = None, metric: Metric = QTM) -> np.ndarray:
+    """
+    Returns the database of the distance to the solved state of every state, indexed by Cube.encode().
+    The database covers the whole state space and is shared between processes through a memory-mapped file;
+    with max_depth, the states deeper than max_depth are marked as UNKNOWN in a private copy.
+
+    Args:
+        max_depth (int | None, optional): The maximum depth to keep. Defaults to None (all states).
+        metric (Metric, optional): The metric of the distances. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The database.
+    """
+    database: np.ndarray = distance_table(metric=metric)
+    if max_depth is not None:
+        database = np.where(database <= max_depth, database, UNKNOWN).astype(np.uint8)
     return database
 
-def database_heuristic(cube: Cube, database: dict[str, int], default_heuristic: Callable[[Cube], int]) -> int:
+def database_heuristic(cube: Cube, database: np.ndarray, default_heuristic: Callable[[Cube], int] | None = None) -> int:
     """
-    Returns a heuristic function that uses the databse heuristic if the entry exists, and the default heuristic otherwise.
+    Returns the database distance of the cube if the entry exists, and the default heuristic otherwise.
 
     Args:
-        default_heuristic (Callable[[Cube], int]): The default heuristic.
+        cube (Cube): The cube to evaluate.
+        database (np.ndarray): The database returned by build_database.
+        default_heuristic (Callable[[Cube], int] | None, optional): The default heuristic. Defaults to None.
 
     Returns:
         int: The heuristic value.
     """
-    if cube.hash() in database:
-        return database[cube.hash()]
+    distance: int = int(database[cube.encode()])
+    if distance != UNKNOWN or default_heuristic is None:
+        return distance
     else:
         return default_heuristic(cube)
+
+def distance_heuristic(cube: Cube, metric: Metric = QTM) -> int:
+    """
+    Returns the exact distance to the solved state, read from the full database.
+    Admissible and consistent in its metric, use functools.partial to search another metric than QTM.
+
+    Args:
+        cube (Cube): The cube to evaluate.
+        metric (Metric, optional): The metric of the distance. Defaults to QTM.
+
+    Returns:
+        int: The distance to the solved state.
+    """
+    return int(distance_table(metric=metric)[cube.encode()])
@@ -0,0 +1,103 @@
+from pocket_cube.cube import Move
+from pocket_cube.metrics import METRICS, QTM
+from collections import Counter
+import argparse
+import asyncio
+import json
+import sys
+import time
+import numpy as np
+
+"""
+Load generator for server.py: keeps a fixed number of keep-alive connections busy with
+random scrambles and reports the throughput, the latency percentiles and the status counts.
+"""
+
+def random_scrambles(count: int, length: int, seed: int, moves: list[Move] = QTM.moves) -> list[str]:
+    rng = np.random.default_rng(seed)
+    return [" ".join(str(moves[move]) for move in scramble) for scramble in rng.integers(len(moves), size=(count, length)).tolist()]
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, target: str,
+                   body: bytes = b"", headers: dict[str, str] | None = None) -> tuple[int, bytes]:
+    lines = [f"{method} {target} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for (name, value) in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+    status: int = int((await reader.readline()).split()[1])
+    length: int = 0
+    while (line := await reader.readline()).strip():
+        (name, _, value) = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return (status, await reader.readexactly(length))
+
+async def _client(host: str, port: int, scrambles: list[str], deadline_ms: float | None, end: float,
+                  latencies: list[float], statuses: Counter):
+    (reader, writer) = await asyncio.open_connection(host, port)
+    headers = {"X-Deadline-Ms": str(deadline_ms)} if deadline_ms is not None else None
+    try:
+        for scramble in scrambles:
+            if time.monotonic() >= end:
+                break
+            start: float = time.perf_counter()
+            (status, _) = await _request(reader, writer, "POST", "/solve", scramble.encode(), headers)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+async def run(host: str, port: int, requests: int, concurrency: int, length: int, duration: float | None,
+              deadline_ms: float | None, seed: int, metric: str = "qtm") -> dict:
+    """
+    Sends the requests over concurrency connections, each waiting for its answer before sending the next one.
+
+    Returns:
+        dict: The client-side report, with the server /metrics at the end of the run.
+    """
+    scrambles: list[str] = random_scrambles(requests, length, seed, METRICS[metric].moves)
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    end: float = time.monotonic() + duration if duration else float("inf")
+
+    start: float = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, scrambles[i::concurrency], deadline_ms, end, latencies, statuses)
+                           for i in range(concurrency)))
+    elapsed: float = time.perf_counter() - start
+
+    (reader, writer) = await asyncio.open_connection(host, port)
+    (_, metrics) = await _request(reader, writer, "GET", "/metrics", headers={"Connection": "close"})
+    writer.close()
+
+    milliseconds = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "ok_rps": statuses[200] / elapsed,
+        "statuses": {str(status): count for (status, count) in sorted(statuses.items())},
+        "latency": {f"p{p}_ms": float(np.percentile(milliseconds, p)) for p in (50, 90, 95, 99)} if len(latencies) else {},
+        "server": json.loads(metrics),
+    }
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure the throughput and latency of a running server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32, help="connections sending requests at once")
+    parser.add_argument("--length", type=int, default=20, help="random moves per scramble")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--deadline-ms", type=float, default=None, help="deadline sent with every request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metric", default="qtm", choices=list(METRICS), help="moves of the scrambles")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.host, args.port, args.requests, args.concurrency, args.length, args.duration,
+                             args.deadline_ms, args.seed, args.metric))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+from pocket_cube.cube import Cube, Move
+from pocket_cube.moves import MOVE_LIST
+from pocket_cube.metrics import Metric, QTM, MOVE_PERMS, MOVE_GETTERS
+from pocket_cube.tables import transition_table
+from stats import SearchStats, timed
+from heuristics import IncrementalHeuristic, incremental
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+import atexit
+import numpy as np
+import os
+
+NO_CHILD: int = -1
+
+# number of worker processes of the parallel searches, set POCKET_CUBE_MCTS_WORKERS to override
+WORKERS: int = int(os.environ.get("POCKET_CUBE_MCTS_WORKERS", 0)) or os.cpu_count() or 1
+# rollouts handed to each worker per round of the leaf parallel search
+LEAVES_PER_WORKER: int = 16
+
+class Tree:
+    """
+    MCTS tree stored as struct-of-arrays: node i has visits[i], values[i] (sum of rewards),
+    parents[i], moves[i] (the move from its parent), states[i] (Cube.encode() rank)
+    and children[i] (one node index per move of the metric, NO_CHILD if unexpanded). The root is node 0.
+    The arrays are preallocated and doubled when full.
+    """
+
+    def __init__(self, root_state: int, capacity: int = 1024, metric: Metric = QTM):
+        self.metric = metric
+        self.size: int = 0
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.parents = np.full(capacity, NO_CHILD, dtype=np.int32)
+        self.moves = np.full(capacity, NO_CHILD, dtype=np.int8)
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.children = np.full((capacity, len(metric.moves)), NO_CHILD, dtype=np.int32)
+        self.add(NO_CHILD, NO_CHILD, root_state)
+
+    def _grow(self):
+        capacity: int = 2 * len(self.visits)
+        for name, fill in (("visits", 0), ("values", 0), ("parents", NO_CHILD), ("moves", NO_CHILD), ("states", 0), ("children", NO_CHILD)):
+            old: np.ndarray = getattr(self, name)
+            new: np.ndarray = np.full((capacity, *old.shape[1:]), fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, parent: int, move: int, state: int) -> int:
+        if self.size == len(self.visits):
+            self._grow()
+        node: int = self.size
+        self.size += 1
+        self.parents[node] = parent
+        self.moves[node] = move
+        self.states[node] = state
+        if parent != NO_CHILD:
+            self.children[parent, move] = node
+        return node
+
+    def select(self, node: int, cp: float) -> int:
+        """
+        Returns the child of a fully expanded node with the highest UCB score.
+        """
+        children: np.ndarray = self.children[node]
+        visits: np.ndarray = self.visits[children]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = self.values[children] / visits + cp * np.sqrt(np.log(self.visits[node]) / visits)
+        # a child that was never visited comes first
+        scores[visits == 0] = np.inf
+        return int(children[scores.argmax()])
+
+    def backpropagate(self, node: int, reward: float, visits: int = 1):
+        """
+        Adds the reward and the visits to the node and its ancestors. Adding a visit without a reward
+        is a virtual loss, which steers the next selections elsewhere until the reward is added with visits=0.
+        """
+        while node != NO_CHILD:
+            self.visits[node] += visits
+            self.values[node] += reward
+            node = int(self.parents[node])
+
+    def path(self, node: int) -> list[Move]:
+        path: list[Move] = []
+        while self.parents[node] != NO_CHILD:
+            path.append(MOVE_LIST[self.moves[node]])
+            node = int(self.parents[node])
+        path.reverse()
+        return path
+
+    def reroot(self, node: int) -> "Tree":
+        """
+        Returns the subtree under the given node, with the node as its root, to reuse the statistics
+        after playing the moves leading to it.
+        """
+        keep: np.ndarray = np.zeros(self.size, dtype=bool)
+        keep[node] = True
+        # parents always have smaller indices, so descendants are found one depth level per pass
+        while True:
+            parents: np.ndarray = self.parents[:self.size]
+            reached: np.ndarray = keep | ((parents != NO_CHILD) & keep[np.maximum(parents, 0)])
+            if (reached == keep).all():
+                break
+            keep = reached
+
+        old: np.ndarray = np.flatnonzero(keep)
+        index: np.ndarray = np.full(self.size + 1, NO_CHILD, dtype=np.int32)
+        index[old] = np.arange(len(old))
+
+        tree: Tree = Tree(int(self.states[node]), capacity=max(len(old), 1), metric=self.metric)
+        tree.size = len(old)
+        tree.visits[:] = self.visits[old]
+        tree.values[:] = self.values[old]
+        tree.states[:] = self.states[old]
+        tree.moves[:] = self.moves[old]
+        tree.parents[:] = index[self.parents[old]]
+        tree.children[:] = index[self.children[old]]
+        tree.parents[0] = NO_CHILD
+        tree.moves[0] = NO_CHILD
+        return tree
+
+SOLVED_REWARD: float = 1 / 0.1
+
+def _descend(tree: Tree, cp: float, rng: np.random.Generator, transitions: np.ndarray) -> tuple[int, int, bool]:
+    """
+    Walks down the tree until a final state or an unexplored move is found, and expands one new move.
+
+    Returns:
+        tuple[int, int, bool]: The node reached, its state and whether it was created.
+    """
+    node: int = 0
+    state: int = int(tree.states[0])
+    while state != 0 and (tree.children[node] != NO_CHILD).all():
+        node = tree.select(node, cp)
+        state = int(tree.states[node])
+    if state == 0:
+        return (node, state, False)
+    move: int = int(rng.choice(np.flatnonzero(tree.children[node] == NO_CHILD)))
+    state = int(transitions[state, move])
+    return (tree.add(node, move, state), state, True)
+
+def _rollout(state: int, heuristic: Callable[[Cube], int], rng: np.random.Generator,
+             transitions: np.ndarray, metric: Metric = QTM) -> tuple[list[int], float, bool]:
+    """
+    Plays random moves of the metric from the state, at most God's number of them, until the cube is solved.
+    A heuristic with an incremental version (see heuristics.incremental) is updated move by move.
+
+    Returns:
+        tuple[list[int], float, bool]: The moves played, the reward (the best 1 / heuristic met on the way)
+            and whether the cube was solved.
+    """
+    moves: list[int] = []
+    max_h: float = 0
+    if state == 0:
+        return (moves, SOLVED_REWARD, True)
+    inc: IncrementalHeuristic | None = incremental(heuristic)
+    if inc is not None:
+        stickers: tuple[int, ...] = tuple(Cube.decode_state(state).tolist())
+        partial = inc.partial(stickers)
+        for move in rng.integers(len(metric.moves), size=metric.gods_number).tolist():
+            state = int(transitions[state, move])
+            partial = inc.child(partial, stickers, move)
+            stickers = MOVE_GETTERS[move](stickers)
+            moves.append(move)
+            max_h = max(max_h, 1 / max(inc.value(partial), 0.1))
+            if state == 0:
+                return (moves, SOLVED_REWARD, True)
+        return (moves, max_h, False)
+
+    stickers: np.ndarray = Cube.decode_state(state)
+    probe: Cube = Cube.from_state(stickers)
+    for move in rng.integers(len(metric.moves), size=metric.gods_number).tolist():
+        state = int(transitions[state, move])
+        stickers = stickers[MOVE_PERMS[move]]
+        moves.append(move)
+        probe.state = stickers
+        max_h = max(max_h, 1 / max(heuristic(probe), 0.1))
+        if state == 0:
+            return (moves, SOLVED_REWARD, True)
+    return (moves, max_h, False)
+
+def mcts(cube0: Cube, budget: int, tree: Tree | None, cp: float, heuristic: Callable[[Cube], int],
+         rng: np.random.Generator | None = None, stats: SearchStats | None = None,
+         metric: Metric = QTM) -> tuple[list[Move], Tree, int]:
+    """
+    Monte Carlo tree search with UCB selection. Each iteration walks down the tree, expands one new move,
+    then plays random moves (at most God's number) rewarded by the best 1 / heuristic met on the way.
+
+    Args:
+        cube0 (Cube): The cube to solve.
+        budget (int): The number of iterations.
+        tree (Tree | None): A tree from a previous call on the same cube, to keep searching it, or None.
+        cp (float): The exploration constant.
+        heuristic (Callable[[Cube], int]): The heuristic.
+        rng (np.random.Generator | None, optional): The random generator. Defaults to a fresh one.
+        stats (SearchStats | None, optional): Filled with the counters and the "select", "rollout", "backpropagate"
+            and "heuristic" timings.
+        metric (Metric, optional): The moves of the tree and of the rollouts. Defaults to QTM.
+
+    Returns:
+        tuple[list[Move], Tree, int]: The solution (empty if none was found), the tree and the number of visited states.
+    """
+    transitions: np.ndarray = transition_table(metric=metric)
+    inc: IncrementalHeuristic | None = incremental(heuristic)
+    heuristic = timed(stats, "heuristic", heuristic) if inc is None else inc.timed(stats)
+    rng = rng or np.random.default_rng()
+    root_state: int = cube0.encode()
+    if tree is None or tree.states[0] != root_state or tree.metric is not metric:
+        tree = Tree(root_state, metric=metric)
+
+    nodes: int = 0
+    rollout_steps: int = 0
+    solution: list[Move] = []
+
+    for _ in range(budget):
+        if stats is None:
+            # untimed, without entering a context per phase on every iteration
+            (node, state, expanded) = _descend(tree, cp, rng, transitions)
+            (rollout, reward, solved) = _rollout(state, heuristic, rng, transitions, metric)
+            tree.backpropagate(node, reward)
+        else:
+            with stats.phase("select"):
+                (node, state, expanded) = _descend(tree, cp, rng, transitions)
+            with stats.phase("rollout"):
+                (rollout, reward, solved) = _rollout(state, heuristic, rng, transitions, metric)
+            with stats.phase("backpropagate"):
+                tree.backpropagate(node, reward)
+        nodes += expanded
+        rollout_steps += len(rollout)
+        if solved:
+            solution = tree.path(node) + [MOVE_LIST[move] for move in rollout]
+            break
+
+    states_visited: int = nodes + rollout_steps
+    if stats is not None:
+        stats.expanded += nodes
+        stats.generated += nodes
+        stats.rollout_steps += rollout_steps
+        stats.on_solution(solution)
+    return (solution, tree, states_visited)
+
+def play_mcts(cube: Cube, budget: int, cp: float, heuristic: Callable[[Cube], int],
+              stats: SearchStats | None = None, metric: Metric = QTM) -> tuple[list[Move], int]:
+    (path, tree, states) = mcts(cube, budget, None, cp, heuristic, stats=stats, metric=metric)
+    return (path, states)
+
+_executors: dict[int, ProcessPoolExecutor] = {}
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns a pool of the given size, kept alive between calls so that repeated searches
+    do not pay for starting processes and loading the tables again.
+    """
+    if workers not in _executors:
+        transition_table()
+        _executors[workers] = ProcessPoolExecutor(max_workers=workers, initializer=transition_table)
+    return _executors[workers]
+
+@atexit.register
+def shutdown_executors():
+    """
+    Shuts down the pools kept by the parallel searches. Called at exit, and safe to call at any time,
+    the next parallel search starting a new pool.
+    """
+    while _executors:
+        (_, executor) = _executors.popitem()
+        executor.shutdown(cancel_futures=True)
+
+def _root_worker(state: np.ndarray, budget: int, cp: float, heuristic: Callable[[Cube], int],
+                 seed: int, metric: Metric = QTM) -> tuple[list[Move], np.ndarray, np.ndarray, int]:
+    (path, tree, states) = mcts(Cube.from_state(state), budget, None, cp, heuristic, np.random.default_rng(seed),
+                                metric=metric)
+    children: np.ndarray = tree.children[0]
+    expanded: np.ndarray = children != NO_CHILD
+    visits: np.ndarray = np.where(expanded, tree.visits[children], 0)
+    values: np.ndarray = np.where(expanded, tree.values[children], 0)
+    return (path, visits, values, states)
+
+def root_parallel_mcts(cube: Cube, budget: int, cp: float, heuristic: Callable[[Cube], int],
+                       workers: int | None = None, metric: Metric = QTM) -> tuple[list[Move], np.ndarray, np.ndarray, int]:
+    """
+    Root parallel MCTS: every worker grows its own tree from the cube with the full budget and a different seed,
+    then the root statistics are merged.
+
+    Args:
+        cube (Cube): The cube to solve.
+        budget (int): The number of iterations of each tree.
+        cp (float): The exploration constant.
+        heuristic (Callable[[Cube], int]): The heuristic, which must be picklable.
+        workers (int | None, optional): The number of trees. Defaults to WORKERS.
+        metric (Metric, optional): The moves of the trees. Defaults to QTM.
+
+    Returns:
+        tuple[list[Move], np.ndarray, np.ndarray, int]: The shortest solution found (empty if none),
+            the summed visits and values of the root children, indexed by Move.value, and the number of visited states.
+    """
+    workers = workers or WORKERS
+    seeds = np.random.SeedSequence().generate_state(workers)
+    if workers == 1:
+        results = [_root_worker(cube.state, budget, cp, heuristic, int(seeds[0]), metric)]
+    else:
+        # built here once, rather than by every worker at once
+        transition_table(metric=metric)
+        futures = [_executor(workers).submit(_root_worker, cube.state, budget, cp, heuristic, int(seed), metric)
+                   for seed in seeds]
+        results = [future.result() for future in futures]
+
+    paths: list[list[Move]] = [path for (path, _, _, _) in results if path]
+    visits: np.ndarray = sum(visits for (_, visits, _, _) in results)
+    values: np.ndarray = sum(values for (_, _, values, _) in results)
+    states: int = sum(states for (_, _, _, states) in results)
+    return (min(paths, key=len) if paths else [], visits, values, states)
+
+def _leaf_worker(states: list[int], heuristic: Callable[[Cube], int], seed: int,
+                 metric: Metric = QTM) -> list[tuple[list[int], float, bool]]:
+    rng: np.random.Generator = np.random.default_rng(seed)
+    transitions: np.ndarray = transition_table(metric=metric)
+    return [_rollout(state, heuristic, rng, transitions, metric) for state in states]
+
+def leaf_parallel_mcts(cube: Cube, budget: int, cp: float, heuristic: Callable[[Cube], int],
+                       workers: int | None = None, metric: Metric = QTM) -> tuple[list[Move], Tree, int]:
+    """
+    Leaf parallel MCTS: a single tree, from which a batch of leaves is selected at a time, each selection adding a
+    virtual loss on its path so that the next ones explore elsewhere. The rollouts of the batch run on the workers,
+    then the virtual losses are replaced by the rewards.
+
+    Args:
+        cube (Cube): The cube to solve.
+        budget (int): The number of iterations.
+        cp (float): The exploration constant.
+        heuristic (Callable[[Cube], int]): The heuristic, which must be picklable.
+        workers (int | None, optional): The number of workers. Defaults to WORKERS.
+        metric (Metric, optional): The moves of the tree and of the rollouts. Defaults to QTM.
+
+    Returns:
+        tuple[list[Move], Tree, int]: The solution (empty if none was found), the tree and the number of visited states.
+    """
+    workers = workers or WORKERS
+    transitions: np.ndarray = transition_table(metric=metric)
+    rng: np.random.Generator = np.random.default_rng()
+    tree: Tree = Tree(cube.encode(), metric=metric)
+    states_visited: int = 0
+
+    while budget > 0:
+        leaves: list[tuple[int, int]] = []
+        for _ in range(min(budget, workers * LEAVES_PER_WORKER)):
+            (node, state, expanded) = _descend(tree, cp, rng, transitions)
+            states_visited += expanded
+            if state == 0:
+                return (tree.path(node), tree, states_visited)
+            tree.backpropagate(node, 0)
+            leaves.append((node, state))
+        budget -= len(leaves)
+
+        chunks = [leaves[i::workers] for i in range(workers)]
+        seeds = rng.integers(2 ** 32, size=workers).tolist()
+        if workers == 1:
+            results = [_leaf_worker([state for (_, state) in chunks[0]], heuristic, seeds[0], metric)]
+        else:
+            futures = [_executor(workers).submit(_leaf_worker, [state for (_, state) in chunk], heuristic, seed, metric)
+                       for (chunk, seed) in zip(chunks, seeds)]
+            results = [future.result() for future in futures]
+
+        for (chunk, rollouts) in zip(chunks, results):
+            for ((node, _), (rollout, reward, solved)) in zip(chunk, rollouts):
+                states_visited += len(rollout)
+                tree.backpropagate(node, reward, visits=0)
+                if solved:
+                    return (tree.path(node) + [MOVE_LIST[move] for move in rollout], tree, states_visited)
+    return ([], tree, states_visited)
+
+def play_root_parallel_mcts(cube: Cube, budget: int, cp: float, heuristic: Callable[[Cube], int]) -> tuple[list[Move], int]:
+    (path, _, _, states) = root_parallel_mcts(cube, budget, cp, heuristic)
+    return (path, states)
+
+def play_leaf_parallel_mcts(cube: Cube, budget: int, cp: float, heuristic: Callable[[Cube], int]) -> tuple[list[Move], int]:
+    (path, _, states) = leaf_parallel_mcts(cube, budget, cp, heuristic)
+    return (path, states)
@@ -0,0 +1,94 @@
+from pocket_cube.cube import Cube, Move
+from pocket_cube.metrics import Metric, QTM
+from pocket_cube.moves import Moves
+from pocket_cube.tables import transition_table, distance_table
+from heuristics import distance_heuristic
+from solvers import Solver, ida_star
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+from itertools import islice
+from typing import Iterable, Iterator
+import os
+
+def solve_optimal(cube: Cube, metric: Metric = QTM) -> tuple[list[Move], int]:
+    """
+    Default solver of solve_many: IDA* guided by the exact distance database.
+
+    Args:
+        cube (Cube): The cube to solve.
+        metric (Metric, optional): The moves of the solution. Defaults to QTM.
+
+    Returns:
+        tuple[list[Move], int]: The solution and the number of expanded states.
+    """
+    return ida_star(cube, partial(distance_heuristic, metric=metric), metric=metric)
+
+def attach_tables(metric: Metric = QTM):
+    """
+    Builds the tables of the metric if they are not cached yet, and memory-maps them.
+    Used as the initializer of worker processes, which then map the same files,
+    so the pages are shared instead of copied per process. Callers also run it once
+    before starting the pool, to build the tables once instead of racing to build them in every worker.
+    """
+    transition_table(metric=metric)
+    distance_table(metric=metric)
+
+def _to_cube(scramble: Cube | Moves) -> Cube:
+    if isinstance(scramble, Cube):
+        return scramble
+    cube = Cube(scrambled=False)
+    cube.state = Cube.move_state(cube.state, scramble)
+    return cube
+
+def solve_chunk(solver: Solver, chunk: list[tuple[int, Cube | Moves]]) -> list[tuple[int, list[Move], int]]:
+    """
+    Solves the (index, scramble) pairs of a chunk, the unit of work sent to a worker process.
+
+    Returns:
+        list[tuple[int, list[Move], int]]: The index of each scramble, its solution and the number of states.
+    """
+    return [(idx, *solver(_to_cube(scramble))) for (idx, scramble) in chunk]
+
+def solve_many(scrambles: Iterable[Cube | Moves], solver: Solver = solve_optimal, workers: int | None = None,
+               chunksize: int = 64, metric: Metric = QTM) -> Iterator[tuple[int, list[Move], int]]:
+    """
+    Solves the scrambles on a pool of worker processes and yields the results as they complete.
+    The scrambles are consumed lazily, with a bounded number of chunks in flight, so the input can be a generator
+    over millions of scrambles.
+
+    Args:
+        scrambles (Iterable[Cube | Moves]): The cubes, or the moves that scramble a solved cube.
+        solver (Solver, optional): The solver, which must be picklable (a module-level function or a
+            functools.partial of one). Defaults to solve_optimal.
+        workers (int | None, optional): The number of processes. Defaults to os.cpu_count().
+        chunksize (int, optional): The number of scrambles sent to a worker at once. Defaults to 64.
+        metric (Metric, optional): The metric of the solutions, passed to the solver unless it is QTM,
+            and whose tables the workers attach. Defaults to QTM.
+
+    Returns:
+        Iterator[tuple[int, list[Move], int]]: The index of the scramble, its solution and the number of states,
+            in completion order.
+    """
+    solver = solver if metric is QTM else partial(solver, metric=metric)
+    workers = workers or os.cpu_count() or 1
+    items = enumerate(scrambles)
+    chunks = iter(lambda: list(islice(items, chunksize)), [])
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from solve_chunk(solver, chunk)
+        return
+
+    attach_tables(metric)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=attach_tables, initargs=(metric,)) as executor:
+        pending = set()
+        for chunk in islice(chunks, 2 * workers):
+            pending.add(executor.submit(solve_chunk, solver, chunk))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for chunk in islice(chunks, 1):
+                    pending.add(executor.submit(solve_chunk, solver, chunk))
+                yield from future.result()
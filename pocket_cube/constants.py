@@ -1,7 +1,7 @@
 import numpy as np
 
 
-__all__ = ['MOVES', 'CORNERS', 'COLORS']
+__all__ = ['MOVES', 'CORNERS', 'COLORS', 'CORNER_FACELETS', 'NUM_STATES', 'GODS_NUMBER']
 
 """
 Sticker indices:
@@ -87,6 +87,32 @@ COLORS = {
 }
 
 
+"""
+Stickers of each corner slot, used by the integer state encoding.
+
+The first sticker of every slot lies on the U face or on the face opposite
+to it, and the other two follow in clockwise order, so a corner twist is
+the same cyclic shift in every slot. R, F and U never touch the last slot
+(stickers 9, 12 and 16), which is why only the first 7 corners take part
+in the encoding.
+"""
+CORNER_FACELETS = [
+    [2,  15, 20],  # TOP_BL
+    [3,  21, 6 ],  # TOP_BR
+    [0,  18, 13],  # TOP_TL
+    [1,  4,  19],  # TOP_TR
+    [11, 22, 14],  # BOT_BL
+    [10, 7,  23],  # BOT_BR
+    [8,  17, 5 ],  # BOT_TR
+    [9,  12, 16],  # BOT_TL (fixed)
+]
+
+# 7! corner permutations times 3^6 corner orientations
+NUM_STATES = 3674160
+# every state is solvable in at most 14 quarter turns
+GODS_NUMBER = 14
+
+
 LETTERS = {
     0: 'B',
     1: 'R',
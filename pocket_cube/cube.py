@@ -1,56 +1,98 @@
 from __future__ import annotations
 
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-from matplotlib import animation
-
-from .constants import MOVES, CORNERS, COLORS, LETTERS
+from .constants import MOVES, LETTERS, CORNER_FACELETS, NUM_STATES
+from .metrics import MOVE_PERMS
 from .moves import Move, MoveInput, MoveSequence
+from .sequence import compile_sequence
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 
+# colours of each corner in its home slot, in slot sticker order
+_HOME_COLORS = [[idx // 4 for idx in slot] for slot in CORNER_FACELETS]
+# colours read from a slot (c0 * 36 + c1 * 6 + c2) -> (corner, twist)
+_CORNER_TWIST = {
+    sum(colors[(j - twist) % 3] * 6 ** (2 - j) for j in range(3)): (corner, twist)
+    for corner, colors in enumerate(_HOME_COLORS) for twist in range(3)
+}
+_FACTORIALS = [720, 120, 24, 6, 2, 1, 1]
+_GOAL_STATE = np.repeat(np.arange(6), 4)
+
+# array versions of the tables above, used by the batch encoders
+_SLOTS = np.array(CORNER_FACELETS[:7])
+_HOME = np.array(_HOME_COLORS[:7])
+_CORNER_LUT = np.zeros(216, dtype=np.intp)
+_TWIST_LUT = np.zeros(216, dtype=np.intp)
+for _key, (_corner, _twist) in _CORNER_TWIST.items():
+    _CORNER_LUT[_key], _TWIST_LUT[_key] = _corner, _twist
+
+
 class Cube:
 
     def __init__(self, moves: Moves | None = None, scrambled: bool = True):
-        self.goal_state = np.repeat(np.arange(6), 4)
-        self.state = np.repeat(np.arange(6), 4)
+        self.goal_state = _GOAL_STATE.copy()
+        self.state = _GOAL_STATE.copy()
 
         if moves or scrambled:
             self.scramble(moves)
 
     def scramble(self, moves: Moves | None = None):
-
+        """
+        Applies the moves, or without moves, replaces the state by one drawn uniformly
+        from the whole state space (see pocket_cube.sampling).
+        """
         if moves is None:
-            num_of_moves = np.random.randint(5, 11)
-            moves = list(np.random.randint(len(MOVES), size=num_of_moves))
+            self.state = Cube.decode_state(np.random.randint(NUM_STATES))
+            return
 
         self.state = Cube.move_state(self.state, moves)
 
-    def move(self, move: Moves) -> Cube:
-        cube = Cube()
-        cube.state = Cube.move_state(self.clone_state(), move)
+    @classmethod
+    def from_state(cls, state: np.ndarray) -> Cube:
+        """
+        Returns a cube in the given state, without scrambling a throwaway cube first.
+
+        Args:
+            state (np.ndarray): The sticker array. It is used as is, not copied.
+
+        Returns:
+            Cube: The cube.
+        """
+        cube = cls.__new__(cls)
+        cube.goal_state = _GOAL_STATE.copy()
+        cube.state = state
         return cube
 
+    def move(self, move: Moves) -> Cube:
+        # move_state returns a new array, so there is nothing to copy
+        return Cube.from_state(Cube.move_state(self.state, move))
+
     @staticmethod
     def move_state(state: np.ndarray, move: Moves) -> np.ndarray:
-        move = Move.parse(move)
+        # a sequence of any length is a single gather once compiled
+        return state[compile_sequence(move).perm]
+
+    @staticmethod
+    def move_states(states: np.ndarray, moves: MoveSequence | None = None) -> np.ndarray:
+        """
+        Applies every move to every state with a single gather.
 
-        if isinstance(move, list):
-            for m in move:
-                state = state[MOVES[m.value]]
-        else:
-            state = state[MOVES[move.value]]
+        Args:
+            states (np.ndarray): The (N, 24) sticker arrays.
+            moves (MoveSequence | None, optional): The moves to apply. Defaults to the six quarter turns.
 
-        return state
+        Returns:
+            np.ndarray: The (N * len(moves), 24) resulting states, grouped by state:
+                row i * len(moves) + j is states[i] after moves[j].
+        """
+        perms = MOVES if moves is None else MOVE_PERMS[[m.value for m in Move.parse(moves)]]
+        return np.asarray(states)[:, perms].reshape(-1, 24)
 
     def clone_state(self) -> np.ndarray:
         return np.copy(self.state)
 
     def clone(self) -> Cube:
-        cube = Cube()
-        cube.state = self.clone_state()
-        return cube
+        return Cube.from_state(self.clone_state())
 
     def hash(self) -> str:
         return Cube.hash_state(self.state)
@@ -60,121 +102,173 @@ class Cube:
         return ''.join(map(str, state))
 
     @staticmethod
-    def _draw_corner(ax, position, colors):
-
-        vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
-                         [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]]) + position
+    def hash_states(states: np.ndarray) -> list[str]:
+        """
+        Batch version of hash_state.
 
-        indices = [(0, 1, 2, 3), (4, 5, 6, 7), (0, 1, 5, 4),
-                   (2, 3, 7, 6), (0, 3, 7, 4), (1, 2, 6, 5)]
+        Args:
+            states (np.ndarray): The (N, 24) sticker arrays.
 
-        faces = [[vertices[idx] for idx in face] for face in indices]
+        Returns:
+            list[str]: The hashes.
+        """
+        # colours are single digits, so the hash is the row read as ASCII
+        digits = (np.asarray(states) + ord('0')).astype(np.uint8)
+        return [row.decode('ascii') for row in map(bytes, digits)]
 
-        ax.add_collection3d(Poly3DCollection(faces, facecolors=colors, linewidths=1, edgecolors='black'))
+    def encode(self) -> int:
+        return Cube.encode_state(self.state)
 
     @staticmethod
-    def _draw_cube(state: np.ndarray, ax):
+    def encode_state(state: np.ndarray) -> int:
+        """
+        Returns the rank of the state in [0, NUM_STATES), 0 being the solved state.
 
-        for corner, (state_idxs, color_idxs) in CORNERS.items():
-            colors = ["gray"] * 6
+        The rank combines the permutation of the 7 corners moved by R, F and U
+        (Lehmer code) with the orientations of the first 6 of them (base 3);
+        the orientation of the 7th follows from the others.
 
-            for sticker_idx, color_idx in zip(state_idxs, color_idxs):
-                colors[color_idx] = COLORS[state[sticker_idx]]
+        Args:
+            state (np.ndarray): The sticker array to encode.
 
-            Cube._draw_corner(ax, corner, colors)
+        Returns:
+            int: The rank of the state.
+        """
+        stickers = state.tolist()
+        used: int = 0
+        rank: int = 0
+        orientation: int = 0
 
-    @staticmethod
-    def render_state(state):
-        fig, ax = plt.subplots(figsize=(7, 5))
-        base_coords = np.array([(0, 1), (1, 1), (0, 0), (1, 0)])
-        offsets = np.array([[0, 0], [1, 0], [2, 0], [-1, 0], [0, 1], [0, -1]]) * 2
+        for i, (a, b, c) in enumerate(CORNER_FACELETS[:7]):
+            corner, twist = _CORNER_TWIST[stickers[a] * 36 + stickers[b] * 6 + stickers[c]]
+            # Lehmer digit: smaller corners not yet placed
+            rank += _FACTORIALS[i] * (corner - (used & ((1 << corner) - 1)).bit_count())
+            used |= 1 << corner
+            orientation = orientation * 3 + twist
 
-        idx = 0
+        # drop the 7th twist, it is implied by the other 6
+        orientation //= 3
 
-        for offset in offsets:
-            for coords in base_coords:
-                rect = plt.Rectangle(coords + offset, 1, 1, edgecolor='black', linewidth=1)
-                rect.set_facecolor(COLORS[state[idx]])
-                ax.add_patch(rect)
+        return rank * 729 + orientation
 
-                idx += 1
+    @staticmethod
+    def decode_state(rank: int) -> np.ndarray:
+        """
+        Returns the sticker array of the state with the given rank. Inverse of encode_state.
 
-        ax.set_xlim(-2.1, 6.1)
-        ax.set_ylim(-2.1, 4.1)
-        ax.axis('off')
-        plt.show()
+        Args:
+            rank (int): The rank of the state, in [0, NUM_STATES).
 
-    def render(self):
-        Cube.render_state(self.state)
+        Returns:
+            np.ndarray: The sticker array.
+        """
+        if not 0 <= rank < NUM_STATES:
+            raise ValueError(f"Invalid state rank {rank}")
 
-    def render3D(self):
+        perm_rank, orientation = divmod(int(rank), 729)
+
+        twists = [0] * 7
+        for i in range(5, -1, -1):
+            orientation, twists[i] = divmod(orientation, 3)
+        twists[6] = -sum(twists[:6]) % 3
 
-        fig = plt.figure(figsize=(4, 4))
-        ax = fig.add_subplot(111, projection='3d')
+        corners = list(range(7))
+        state = np.repeat(np.arange(6), 4)
 
-        Cube._draw_cube(self.state, ax)
+        for i, slot in enumerate(CORNER_FACELETS[:7]):
+            digit, perm_rank = divmod(perm_rank, _FACTORIALS[i])
+            colors = _HOME_COLORS[corners.pop(digit)]
+            for j in range(3):
+                state[slot[(twists[i] + j) % 3]] = colors[j]
 
-        ax.axis('off')
-        ax.set_xlim([0, 2])
-        ax.set_ylim([0, 2])
-        ax.set_zlim([0, 2])
-        plt.show()
+        return state
 
     @staticmethod
-    def render3D_moves(initial_state: np.ndarray, moves: MoveSequence, save: bool = False):
-        moves = Move.parse(moves)
+    def encode_states(states: np.ndarray) -> np.ndarray:
+        """
+        Batch version of encode_state.
+
+        Args:
+            states (np.ndarray): The (N, 24) sticker arrays to encode.
 
-        original_state = np.copy(initial_state)
-        state = initial_state
+        Returns:
+            np.ndarray: The (N,) int32 ranks.
+        """
+        colors = np.asarray(states)[:, _SLOTS].astype(np.intp)
+        keys = (colors[..., 0] * 6 + colors[..., 1]) * 6 + colors[..., 2]
+        corners = _CORNER_LUT[keys]
+        twists = _TWIST_LUT[keys]
 
-        fig = plt.figure(figsize=(4, 4), frameon=False)
-        ax = fig.add_subplot(111, projection='3d')
+        ranks = np.zeros(len(corners), dtype=np.int64)
+        for i in range(6):
+            smaller = (corners[:, i + 1:] < corners[:, i:i + 1]).sum(axis=1)
+            ranks += _FACTORIALS[i] * smaller
 
-        Cube._draw_cube(state, ax)
+        orientations = twists[:, :6] @ np.array([243, 81, 27, 9, 3, 1])
 
-        ax.axis('off')
-        ax.set_xlim([0, 2])
-        ax.set_ylim([0, 2])
-        ax.set_zlim([0, 2])
+        return (ranks * 729 + orientations).astype(np.int32)
 
-        move_index = 0
+    @staticmethod
+    def decode_states(ranks: np.ndarray, dtype: np.dtype = np.uint8) -> np.ndarray:
+        """
+        Batch version of decode_state.
 
-        def init():
-            Cube._draw_cube(state, ax)
-            return ax
+        Args:
+            ranks (np.ndarray): The (N,) ranks to decode.
+            dtype (np.dtype, optional): The dtype of the result. Defaults to np.uint8.
 
-        def animate(i):
-            nonlocal move_index
+        Returns:
+            np.ndarray: The (N, 24) sticker arrays.
+        """
+        perm_ranks, orientations = np.divmod(np.asarray(ranks, dtype=np.int64), 729)
 
-            if i == 0:  # For the initial frame, show the original state
-                state[:] = np.copy(original_state)
-                Cube._draw_cube(state, ax)
+        twists = np.empty((len(perm_ranks), 7), dtype=np.intp)
+        for i in range(5, -1, -1):
+            orientations, twists[:, i] = np.divmod(orientations, 3)
+        twists[:, 6] = -twists[:, :6].sum(axis=1) % 3
 
-            else:
-                if move_index < len(moves):  # Check if there are more moves to perform
-                    state[:] = Cube.move_state(state, moves[move_index])
-                    ax.clear()
+        # Lehmer digits, then turn them into a permutation from right to left
+        corners = np.empty((len(perm_ranks), 7), dtype=np.intp)
+        for i in range(7):
+            corners[:, i] = perm_ranks // _FACTORIALS[i] % (7 - i)
+        for i in range(5, -1, -1):
+            corners[:, i + 1:] += corners[:, i + 1:] >= corners[:, i:i + 1]
 
-                    Cube._draw_cube(state, ax)
-                    move_index += 1
-                    ax.axis('off')
-                    ax.set_xlim([0, 2])
-                    ax.set_ylim([0, 2])
-                    ax.set_zlim([0, 2])
-                else:
+        states = np.tile(np.repeat(np.arange(6, dtype=dtype), 4), (len(perm_ranks), 1))
+        for i, slot in enumerate(_SLOTS):
+            for k in range(3):
+                states[:, slot[k]] = _HOME[corners[:, i], (k - twists[:, i]) % 3]
 
-                    move_index = 0
-                    state[:] = np.copy(original_state)
-                    Cube._draw_cube(state, ax)
+        return states
 
-        ani = animation.FuncAnimation(fig, animate, frames=len(moves) + 2, init_func=init,
-                                      interval=1000, blit=False)
+    # rendering lives in pocket_cube.render, which is only imported (with matplotlib) on first use
 
-        if save:
-            ani.save('rubiks_cube_animation.gif', writer='pillow', fps=1)
+    @staticmethod
+    def _draw_corner(ax, position, colors):
+        from .render import draw_corner
+        draw_corner(ax, position, colors)
+
+    @staticmethod
+    def _draw_cube(state: np.ndarray, ax):
+        from .render import draw_cube
+        draw_cube(state, ax)
 
-        plt.show()
-        return ani
+    @staticmethod
+    def render_state(state):
+        from .render import render_state
+        render_state(state)
+
+    def render(self):
+        Cube.render_state(self.state)
+
+    def render3D(self):
+        from .render import render3D
+        render3D(self.state)
+
+    @staticmethod
+    def render3D_moves(initial_state: np.ndarray, moves: MoveSequence, save: bool = False):
+        from .render import render3D_moves
+        return render3D_moves(initial_state, moves, save)
 
     def render_text(self):
         lines = [
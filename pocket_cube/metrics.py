@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from .constants import MOVES
+from .moves import Move
+
+from operator import itemgetter
+import numpy as np
+
+
+__all__ = ['Metric', 'QTM', 'HTM', 'METRICS', 'MOVE_PERMS', 'MOVE_GETTERS', 'COMPOSITIONS', 'get_metric']
+
+"""
+Move sets, or metrics: the moves solutions are made of, each counting as one move.
+
+QTM, the quarter-turn metric, has the six quarter turns of MOVES. HTM, the half-turn
+metric, adds R2, F2 and U2, which brings God's number down from 14 to 11. The moves
+of a metric are the first Move values, so the column of a move in the tables of a
+metric (see pocket_cube.tables) is its Move.value in every metric.
+"""
+
+# every move as quarter turns, from which its permutation and its transitions are composed
+COMPOSITIONS: dict[Move, tuple[Move, ...]] = {
+    Move.R: (Move.R,),
+    Move.F: (Move.F,),
+    Move.U: (Move.U,),
+    Move.Rp: (Move.Rp,),
+    Move.Fp: (Move.Fp,),
+    Move.Up: (Move.Up,),
+    Move.R2: (Move.R, Move.R),
+    Move.F2: (Move.F, Move.F),
+    Move.U2: (Move.U, Move.U),
+}
+
+
+def _compose(moves: tuple[Move, ...]) -> np.ndarray:
+    perm = np.arange(24)
+    for move in moves:
+        perm = perm[MOVES[move.value]]
+    return perm
+
+
+# sticker permutation of every move, by Move.value: state[MOVE_PERMS[move.value]] is the state after the move
+MOVE_PERMS = np.array([_compose(COMPOSITIONS[move]) for move in Move])
+MOVE_PERMS.setflags(write=False)
+# the same permutations as getters, for the searches that keep states as tuples: MOVE_GETTERS[move.value](state)
+MOVE_GETTERS: list[itemgetter] = [itemgetter(*perm) for perm in MOVE_PERMS.tolist()]
+
+
+class Metric:
+    """
+    A move set, with the move pruning rules of the searches generated from its permutations:
+    a move is pruned after the last one or two moves of a path if the resulting two or three
+    moves have the same effect as a shorter sequence. In QTM that is undoing the last move
+    and a third quarter turn of the same face in a row, in HTM any second turn of the same face.
+    """
+
+    def __init__(self, name: str, size: int, gods_number: int):
+        self.name = name
+        self.moves: list[Move] = list(Move)[:size]
+        self.perms: np.ndarray = MOVE_PERMS[:size]
+        self.gods_number = gods_number
+        self.opposites: list[int] = [move.opposite().value for move in self.moves]
+        # bits per move in the packed move table, the all ones value marking the solved state
+        self.move_bits: int = size.bit_length()
+        self.no_move: int = (1 << self.move_bits) - 1
+        # successors[before][last]: the moves to try after the moves before and last, -1 if the path is shorter
+        self.successors: list[list[list[int]]] = self._successors()
+
+    def _successors(self) -> list[list[list[int]]]:
+        size: int = len(self.moves)
+        identity = np.arange(24)
+        # the effects of the sequences of at most one move, then of at most two moves
+        shorter: set[bytes] = {identity.tobytes()} | {perm.tobytes() for perm in self.perms}
+        pairs: list[list[np.ndarray]] = [[first[second] for second in self.perms] for first in self.perms]
+        allowed: list[list[bool]] = [[pair.tobytes() not in shorter for pair in row] for row in pairs]
+        shorter_than_three: set[bytes] = shorter | {pairs[first][second].tobytes()
+                                                    for first in range(size) for second in range(size) if allowed[first][second]}
+
+        # one more entry per list, so that index -1 is the empty path
+        successors: list[list[list[int]]] = [[[] for _ in range(size + 1)] for _ in range(size + 1)]
+        successors[-1][-1] = list(range(size))
+        for last in range(size):
+            successors[-1][last] = [move for move in range(size) if allowed[last][move]]
+            for before in range(size):
+                successors[before][last] = [move for move in successors[-1][last]
+                                            if pairs[before][last][self.perms[move]].tobytes() not in shorter_than_three]
+        return successors
+
+    def __reduce__(self):
+        # unpickled as the module's own instance, so that a metric sent to a worker process is still QTM or HTM
+        return (get_metric, (self.name,))
+
+    def __repr__(self) -> str:
+        return f"Metric('{self.name}')"
+
+
+QTM = Metric("qtm", 6, 14)
+HTM = Metric("htm", 9, 11)
+
+METRICS: dict[str, Metric] = {metric.name: metric for metric in (QTM, HTM)}
+
+
+def get_metric(metric: Metric | str) -> Metric:
+    """
+    Returns the metric, given as is or by name ("qtm" or "htm").
+    """
+    if isinstance(metric, Metric):
+        return metric
+    if metric not in METRICS:
+        raise ValueError(f"Invalid metric {metric}, expected one of {list(METRICS)}")
+    return METRICS[metric]
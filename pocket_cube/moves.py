@@ -17,33 +17,20 @@ class Move(Enum):
     Rp = 3
     Fp = 4
     Up = 5
+    R2 = 6
+    F2 = 7
+    U2 = 8
 
     def opposite(self) -> Move:
-        opposites = {
-            Move.R: Move.Rp,
-            Move.F: Move.Fp,
-            Move.U: Move.Up,
-            Move.Rp: Move.R,
-            Move.Fp: Move.F,
-            Move.Up: Move.U
-        }
-        return opposites[self]
+        return _OPPOSITES[self]
 
     @classmethod
     def from_str(cls, move_str: str) -> Move:
-        move_dict = {
-            'R':  Move.R,
-            'F':  Move.F,
-            'U':  Move.U,
-            "R'": Move.Rp,
-            "F'": Move.Fp,
-            "U'": Move.Up
-        }
-        return move_dict[move_str]
+        return _FROM_STR[move_str]
 
     @classmethod
     def from_int(cls, move_int: Number) -> Move:
-        if 0 <= move_int <= 5:
+        if 0 <= move_int < len(_TO_STR):
             return Move(move_int)
         else:
             raise ValueError(f"Invalid move {move_int}")
@@ -52,14 +39,14 @@ class Move(Enum):
     def parse(cls, move_input: Moves) -> Union[Move, List[Move]]:
 
         if isinstance(move_input, list):
-            return [cls.parse(move) for move in move_input]
+            return _parse_sequence(move_input)
 
         if isinstance(move_input, Number):
             return cls.from_int(move_input)
 
         elif isinstance(move_input, str):
             if " " in move_input:
-                return [cls.parse(move) for move in move_input.split(" ")]
+                return _parse_sequence(move_input.split(" "))
 
             return cls.from_str(move_input)
 
@@ -69,12 +56,95 @@ class Move(Enum):
             raise ValueError(f"Invalid move type: {move_input}")
 
     def __str__(self) -> str:
-        move_str = {
-            Move.R:  'R',
-            Move.F:  'F',
-            Move.U:  'U',
-            Move.Rp: "R'",
-            Move.Fp: "F'",
-            Move.Up: "U'"
-        }
-        return move_str[self]
+        return _TO_STR[self]
+
+
+# every move, indexed by Move.value
+MOVE_LIST: List[Move] = list(Move)
+
+# built once, the Move methods above only look them up
+_OPPOSITES = {
+    Move.R: Move.Rp,
+    Move.F: Move.Fp,
+    Move.U: Move.Up,
+    Move.Rp: Move.R,
+    Move.Fp: Move.F,
+    Move.Up: Move.U,
+    Move.R2: Move.R2,
+    Move.F2: Move.F2,
+    Move.U2: Move.U2
+}
+
+_TO_STR = {
+    Move.R:  'R',
+    Move.F:  'F',
+    Move.U:  'U',
+    Move.Rp: "R'",
+    Move.Fp: "F'",
+    Move.Up: "U'",
+    Move.R2: 'R2',
+    Move.F2: 'F2',
+    Move.U2: 'U2'
+}
+
+_FROM_STR = {move_str: move for move, move_str in _TO_STR.items()}
+
+# R, F and U never move the corner between L, D and B, which the encoding keeps fixed. Turning L, D or B
+# moves the rest of the cube relative to that corner exactly like turning the opposite face the same way,
+# so once the cube is turned as a whole to bring the corner back home, L is R, D is U and B is F. The
+# faces named by the moves after it are then those of the turned cube (see _parse_sequence).
+_FROM_STR.update({
+    'L': Move.R, "L'": Move.Rp, 'L2': Move.R2,
+    'D': Move.U, "D'": Move.Up, 'D2': Move.U2,
+    'B': Move.F, "B'": Move.Fp, 'B2': Move.F2,
+})
+
+# outward normal of each face, x to the right, y up and z towards the viewer
+_NORMALS = {'R': (1, 0, 0), 'U': (0, 1, 0), 'F': (0, 0, 1), 'L': (-1, 0, 0), 'D': (0, -1, 0), 'B': (0, 0, -1)}
+_FACE_OF = {normal: face for face, normal in _NORMALS.items()}
+_QUARTER_TURNS = {'': 1, '2': 2, "'": 3}
+_IDENTITY = {face: face for face in _NORMALS}
+
+
+def _turn(axis: tuple[int, ...], vector: tuple[int, ...], quarter_turns: int) -> tuple[int, ...]:
+    # the vector turned clockwise around the axis, seen from the axis' side
+    for _ in range(quarter_turns):
+        cross = (axis[1] * vector[2] - axis[2] * vector[1],
+                 axis[2] * vector[0] - axis[0] * vector[2],
+                 axis[0] * vector[1] - axis[1] * vector[0])
+        dot = sum(a * v for a, v in zip(axis, vector))
+        vector = tuple(a * dot - c for a, c in zip(axis, cross))
+    return vector
+
+
+# _REFRAME[move][face]: the face that the face ends up as, once the cube is turned back after the move
+# stood in for a turn of the opposite face
+_REFRAME = {
+    move: {face: _FACE_OF[_turn(_NORMALS[move_str[0]], normal, _QUARTER_TURNS[move_str[1:]])]
+           for face, normal in _NORMALS.items()}
+    for move, move_str in _TO_STR.items()
+}
+
+
+def _parse_sequence(move_inputs: list) -> List[Move]:
+    # frame maps each face of the cube as it is held to that face once the cube is turned back,
+    # None until the first L, D or B
+    frame = None
+    moves: List[Move] = []
+    for move_input in move_inputs:
+        if isinstance(move_input, str):
+            move_str = move_input
+        else:
+            move = move_input if isinstance(move_input, Move) else Move.parse(move_input)
+            if frame is None:
+                moves.append(move)
+                continue
+            move_str = _TO_STR[move]
+        if move_str not in _FROM_STR:
+            raise ValueError(f"Invalid move {move_str}")
+        face = move_str[0] if frame is None else frame[move_str[0]]
+        move = _FROM_STR[face + move_str[1:]]
+        if face not in 'RFU':
+            frame = {held: _REFRAME[move][turned] for held, turned in (frame or _IDENTITY).items()}
+        moves.append(move)
+    return moves
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+from matplotlib import animation
+
+from .constants import CORNERS, COLORS
+from .cube import Cube
+from .moves import Move, MoveSequence
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+"""
+Matplotlib rendering of the cube, kept apart so that importing pocket_cube
+only needs NumPy. The Cube render methods import this module on first use.
+"""
+
+
+def draw_corner(ax, position, colors):
+
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                     [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]]) + position
+
+    indices = [(0, 1, 2, 3), (4, 5, 6, 7), (0, 1, 5, 4),
+               (2, 3, 7, 6), (0, 3, 7, 4), (1, 2, 6, 5)]
+
+    faces = [[vertices[idx] for idx in face] for face in indices]
+
+    ax.add_collection3d(Poly3DCollection(faces, facecolors=colors, linewidths=1, edgecolors='black'))
+
+
+def draw_cube(state: np.ndarray, ax):
+
+    for corner, (state_idxs, color_idxs) in CORNERS.items():
+        colors = ["gray"] * 6
+
+        for sticker_idx, color_idx in zip(state_idxs, color_idxs):
+            colors[color_idx] = COLORS[state[sticker_idx]]
+
+        draw_corner(ax, corner, colors)
+
+
+def render_state(state):
+    fig, ax = plt.subplots(figsize=(7, 5))
+    base_coords = np.array([(0, 1), (1, 1), (0, 0), (1, 0)])
+    offsets = np.array([[0, 0], [1, 0], [2, 0], [-1, 0], [0, 1], [0, -1]]) * 2
+
+    idx = 0
+
+    for offset in offsets:
+        for coords in base_coords:
+            rect = plt.Rectangle(coords + offset, 1, 1, edgecolor='black', linewidth=1)
+            rect.set_facecolor(COLORS[state[idx]])
+            ax.add_patch(rect)
+
+            idx += 1
+
+    ax.set_xlim(-2.1, 6.1)
+    ax.set_ylim(-2.1, 4.1)
+    ax.axis('off')
+    plt.show()
+
+
+def render3D(state: np.ndarray):
+
+    fig = plt.figure(figsize=(4, 4))
+    ax = fig.add_subplot(111, projection='3d')
+
+    draw_cube(state, ax)
+
+    ax.axis('off')
+    ax.set_xlim([0, 2])
+    ax.set_ylim([0, 2])
+    ax.set_zlim([0, 2])
+    plt.show()
+
+
+def render3D_moves(initial_state: np.ndarray, moves: MoveSequence, save: bool = False):
+    moves = Move.parse(moves)
+
+    original_state = np.copy(initial_state)
+    state = initial_state
+
+    fig = plt.figure(figsize=(4, 4), frameon=False)
+    ax = fig.add_subplot(111, projection='3d')
+
+    draw_cube(state, ax)
+
+    ax.axis('off')
+    ax.set_xlim([0, 2])
+    ax.set_ylim([0, 2])
+    ax.set_zlim([0, 2])
+
+    move_index = 0
+
+    def init():
+        draw_cube(state, ax)
+        return ax
+
+    def animate(i):
+        nonlocal move_index
+
+        if i == 0:  # For the initial frame, show the original state
+            state[:] = np.copy(original_state)
+            draw_cube(state, ax)
+
+        else:
+            if move_index < len(moves):  # Check if there are more moves to perform
+                state[:] = Cube.move_state(state, moves[move_index])
+                ax.clear()
+
+                draw_cube(state, ax)
+                move_index += 1
+                ax.axis('off')
+                ax.set_xlim([0, 2])
+                ax.set_ylim([0, 2])
+                ax.set_zlim([0, 2])
+            else:
+
+                move_index = 0
+                state[:] = np.copy(original_state)
+                draw_cube(state, ax)
+
+    ani = animation.FuncAnimation(fig, animate, frames=len(moves) + 2, init_func=init,
+                                  interval=1000, blit=False)
+
+    if save:
+        ani.save('rubiks_cube_animation.gif', writer='pillow', fps=1)
+
+    plt.show()
+    return ani
\ No newline at end of file
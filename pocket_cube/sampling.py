@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+from .constants import NUM_STATES
+from .cube import Cube
+from .metrics import Metric, QTM
+from .tables import distance_table
+
+import numpy as np
+
+
+__all__ = ['sample', 'sample_ranks']
+
+"""
+Uniform sampling of the reachable states.
+
+Every rank below NUM_STATES is a reachable state, so drawing ranks uniformly
+and decoding them draws states uniformly, unlike a few random moves from the
+solved state, which mostly reach shallow states. Sampling at a fixed optimal
+depth draws uniformly among the ranks at that distance in the distance table
+of the metric.
+"""
+
+
+@lru_cache(maxsize=None)
+def _ranks_at(depth: int, metric: Metric = QTM) -> np.ndarray:
+    ranks = np.flatnonzero(distance_table(metric=metric) == depth).astype(np.int32)
+    ranks.setflags(write=False)
+    return ranks
+
+
+def sample_ranks(n: int, rng: np.random.Generator | None = None, depth: int | None = None,
+                 metric: Metric = QTM) -> np.ndarray:
+    """
+    Draws n ranks uniformly, with replacement.
+
+    Args:
+        n (int): The number of ranks.
+        rng (np.random.Generator | None, optional): The random generator. Defaults to a fresh one.
+        depth (int | None, optional): The optimal distance of the states to draw. Defaults to any distance.
+        metric (Metric, optional): The metric of the distance. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The (n,) int32 ranks.
+    """
+    rng = rng or np.random.default_rng()
+    if depth is None:
+        return rng.integers(NUM_STATES, size=n, dtype=np.int32)
+    if not 0 <= depth <= metric.gods_number:
+        raise ValueError(f"Invalid depth {depth}, expected 0 to {metric.gods_number}")
+    ranks = _ranks_at(depth, metric)
+    return ranks[rng.integers(len(ranks), size=n)]
+
+
+def sample(n: int, rng: np.random.Generator | None = None, depth: int | None = None,
+           dtype: np.dtype = np.uint8, metric: Metric = QTM) -> np.ndarray:
+    """
+    Draws n states uniformly, with replacement.
+
+    Args:
+        n (int): The number of states.
+        rng (np.random.Generator | None, optional): The random generator. Defaults to a fresh one.
+        depth (int | None, optional): The optimal distance of the states to draw. Defaults to any distance.
+        dtype (np.dtype, optional): The dtype of the result. Defaults to np.uint8.
+        metric (Metric, optional): The metric of the distance. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The (n, 24) sticker arrays.
+    """
+    return Cube.decode_states(sample_ranks(n, rng, depth, metric), dtype=dtype)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+from .metrics import MOVE_PERMS
+from .moves import Move, Moves
+
+import numpy as np
+
+
+__all__ = ['CompiledSequence', 'compile_sequence', 'verify_solutions']
+
+_IDENTITY = np.arange(24)
+_IDENTITY.setflags(write=False)
+_GOAL_STATE = np.repeat(np.arange(6), 4)
+
+
+class CompiledSequence:
+    """
+    A sequence of moves composed into a single sticker permutation:
+    applying the whole sequence to a state is one gather, state[perm].
+    """
+
+    def __init__(self, moves: tuple[Move, ...], perm: np.ndarray):
+        self.moves = moves
+        self.perm = perm
+        self.perm.setflags(write=False)
+
+    def apply(self, state: np.ndarray) -> np.ndarray:
+        return state[self.perm]
+
+    def apply_many(self, states: np.ndarray) -> np.ndarray:
+        """
+        Applies the sequence to every row of an (N, 24) array.
+        """
+        return states[:, self.perm]
+
+    def inverse(self) -> CompiledSequence:
+        return CompiledSequence(tuple(move.opposite() for move in reversed(self.moves)), np.argsort(self.perm))
+
+    def __mul__(self, other: CompiledSequence) -> CompiledSequence:
+        """
+        Returns the sequence playing self, then other.
+        """
+        return CompiledSequence(self.moves + other.moves, self.perm[other.perm])
+
+    def __pow__(self, power: int) -> CompiledSequence:
+        if power < 0:
+            return self.inverse() ** -power
+
+        # square and multiply on the permutation, the moves are just repeated
+        perm, square = _IDENTITY, self.perm
+        exponent = power
+        while exponent:
+            if exponent & 1:
+                perm = perm[square]
+            square = square[square]
+            exponent >>= 1
+
+        return CompiledSequence(self.moves * power, perm.copy())
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __iter__(self):
+        return iter(self.moves)
+
+    def __str__(self) -> str:
+        return " ".join(map(str, self.moves))
+
+    def __repr__(self) -> str:
+        return f"CompiledSequence('{self}')"
+
+
+@lru_cache(maxsize=4096)
+def _compile_moves(moves: tuple[Move, ...]) -> CompiledSequence:
+    perm = _IDENTITY
+    for move in moves:
+        perm = perm[MOVE_PERMS[move.value]]
+    return CompiledSequence(moves, perm.copy())
+
+
+@lru_cache(maxsize=4096)
+def _compile_str(moves: str) -> CompiledSequence:
+    return _compile_moves(tuple(_as_list(Move.parse(moves))))
+
+
+def _as_list(moves) -> list[Move]:
+    return moves if isinstance(moves, list) else [moves]
+
+
+def compile_sequence(moves: Moves | CompiledSequence) -> CompiledSequence:
+    """
+    Parses and composes the moves once. The most recently used sequences are cached.
+
+    Args:
+        moves (Moves | CompiledSequence): The moves, in any format accepted by Move.parse.
+
+    Returns:
+        CompiledSequence: The compiled sequence.
+    """
+    if isinstance(moves, CompiledSequence):
+        return moves
+    if isinstance(moves, Move):
+        return _compile_moves((moves,))
+    if isinstance(moves, str):
+        return _compile_str(moves)
+    return _compile_moves(tuple(_as_list(Move.parse(moves))))
+
+
+def verify_solutions(states: np.ndarray, solutions: list[Moves | CompiledSequence]) -> np.ndarray:
+    """
+    Checks that each solution solves its state, with a single gather over all of them.
+
+    Args:
+        states (np.ndarray): The (N, 24) scrambled states.
+        solutions (list[Moves | CompiledSequence]): The N solutions.
+
+    Returns:
+        np.ndarray: The (N,) booleans, True where the solution solves the state.
+    """
+    perms = np.array([compile_sequence(solution).perm for solution in solutions]).reshape(-1, 24)
+    solved = np.take_along_axis(np.asarray(states), perms, axis=1)
+    return (solved == _GOAL_STATE).all(axis=1)
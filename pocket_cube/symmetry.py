@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from itertools import permutations, product
+
+from .constants import CORNERS
+from .cube import Cube
+from .metrics import MOVE_PERMS
+from .moves import Move, MoveSequence, MOVE_LIST
+
+import numpy as np
+
+
+__all__ = ['NUM_SYMMETRIES', 'canonicalize', 'apply_symmetry', 'map_solution']
+
+"""
+Symmetry reduction of the state space.
+
+Each of the 48 symmetries of the cube (24 rotations, 24 reflections) maps a
+state to a symmetric one: the stickers are moved by the symmetry and the
+colours are relabelled so that the solved state stays solved. The result is
+then turned as a whole so that the corner R, F and U never move is back in
+its slot, which does not change the state. Symmetric states are equally far
+from the solved state, so a search or a table only needs the representative
+of each class, the one with the smallest Cube.encode() rank.
+
+A symmetry is stored as a colour relabelling and a sticker permutation P,
+the symmetric state being colors[state[P]].
+"""
+
+# outward normal of each side of a corner, as numbered in CORNERS
+_SIDE_NORMALS = [(0, 0, -1), (0, 0, 1), (0, -1, 0), (0, 1, 0), (-1, 0, 0), (1, 0, 0)]
+
+# every sticker as (centred corner position, normal)
+_STICKERS = [None] * 24
+for _corner, (_idxs, _sides) in CORNERS.items():
+    for _idx, _side in zip(_idxs, _sides):
+        _STICKERS[_idx] = (np.array(_corner) * 2 - 1, np.array(_SIDE_NORMALS[_side]))
+_STICKER_AT = {(tuple(pos), tuple(normal)): idx for idx, (pos, normal) in enumerate(_STICKERS)}
+# normal of each face, the face of a sticker being idx // 4
+_FACE_AT = {tuple(_STICKERS[face * 4][1]): face for face in range(6)}
+
+# the 48 signed permutation matrices, rotations (det = 1) first
+_MATRICES = sorted((np.array([[sign[row] if col == perm[row] else 0 for col in range(3)] for row in range(3)])
+                    for perm in permutations(range(3)) for sign in product((1, -1), repeat=3)),
+                   key=lambda matrix: -round(np.linalg.det(matrix)))
+
+
+def _sticker_permutation(matrix: np.ndarray) -> np.ndarray:
+    """
+    Returns P such that state[P] is the state turned (or mirrored) by the matrix.
+    """
+    perm = np.empty(24, dtype=np.intp)
+    for idx, (pos, normal) in enumerate(_STICKERS):
+        perm[_STICKER_AT[tuple(matrix @ pos), tuple(matrix @ normal)]] = idx
+    return perm
+
+
+def _color_permutation(matrix: np.ndarray) -> np.ndarray:
+    return np.array([_FACE_AT[tuple(matrix @ _STICKERS[face * 4][1])] for face in range(6)])
+
+
+_ROTATIONS = np.array([_sticker_permutation(matrix) for matrix in _MATRICES[:24]])
+
+NUM_SYMMETRIES = len(_MATRICES)
+
+# all (symmetry, whole cube rotation) pairs: only one rotation per symmetry brings the fixed corner home
+_COLORS = np.repeat([_color_permutation(matrix) for matrix in _MATRICES], 24, axis=0)
+_PERMS = np.array([_sticker_permutation(matrix)[rotation] for matrix in _MATRICES for rotation in _ROTATIONS])
+# (symmetry, sticker permutation) -> transform index, to follow a solution across whole cube rotations
+_TRANSFORM_OF = {(transform // 24, perm.tobytes()): transform for transform, perm in enumerate(_PERMS)}
+
+_FIXED_STICKERS = [9, 12, 16]
+_FIXED_COLORS = np.array([2, 3, 4])
+_FIXED_PERMS = _PERMS[:, _FIXED_STICKERS]
+
+_INVERSE_MOVES = np.argsort(MOVE_PERMS, axis=1)
+
+
+def _can_keep_fixed_corner_home(transform: int) -> bool:
+    # the fixed corner never leaves its slot, and the other corners reach every other slot in every twist,
+    # so the transform keeps the fixed corner home for some state if it reads the fixed corner's colours
+    # from its home slot in the right order, or another corner's colours from another slot
+    colors, slot = _COLORS[transform], _FIXED_PERMS[transform]
+    from_home = set(slot.tolist()) == set(_FIXED_STICKERS)
+    needs_fixed_corner = set(np.argsort(colors)[_FIXED_COLORS].tolist()) == set(_FIXED_COLORS.tolist())
+    if from_home and needs_fixed_corner:
+        return bool((colors[slot // 4] == _FIXED_COLORS).all())
+    return not from_home and not needs_fixed_corner
+
+
+# the transforms canonicalize can return
+_HOME_TRANSFORMS = frozenset(filter(_can_keep_fixed_corner_home, range(len(_PERMS))))
+
+
+def apply_symmetry(state: np.ndarray, transform: int) -> np.ndarray:
+    """
+    Returns the state mapped by the given transform.
+
+    Args:
+        state (np.ndarray): The sticker array.
+        transform (int): The transform, as returned by canonicalize.
+
+    Returns:
+        np.ndarray: The symmetric state.
+    """
+    return _COLORS[transform][state[_PERMS[transform]]]
+
+
+def canonicalize(state: np.ndarray) -> tuple[int, int]:
+    """
+    Returns the representative of the symmetry class of the state, and the transform that maps the state to it.
+
+    Args:
+        state (np.ndarray): The sticker array.
+
+    Returns:
+        tuple[int, int]: The rank of the representative and the transform, for apply_symmetry and map_solution.
+    """
+    # look at the fixed corner first, only 48 of the transforms bring the right corner there
+    fixed = np.take_along_axis(_COLORS, state[_FIXED_PERMS], axis=1)
+    transforms = np.flatnonzero((fixed == _FIXED_COLORS).all(axis=1))
+    candidates = np.take_along_axis(_COLORS[transforms], state[_PERMS[transforms]], axis=1)
+    ranks = Cube.encode_states(candidates)
+    best = int(np.argmin(ranks))
+    return (int(ranks[best]), int(transforms[best]))
+
+
+def map_solution(moves: MoveSequence, transform: int) -> list[Move]:
+    """
+    Maps a solution of the representative back to a solution of the original state.
+
+    A move of the representative is a quarter or half turn of some face of the original state. When that face is
+    one that R, F and U leave alone, the opposite face is turned instead, which is the same move followed
+    by a whole cube rotation that the transform absorbs. A transform that canonicalize cannot return,
+    one that does not keep the fixed corner home, raises a ValueError.
+
+    Args:
+        moves (MoveSequence): The solution of apply_symmetry(state, transform).
+        transform (int): The transform returned by canonicalize(state).
+
+    Returns:
+        list[Move]: The solution of the state, of the same length.
+    """
+    if transform not in _HOME_TRANSFORMS:
+        raise ValueError(f"Invalid transform {transform}, it cannot keep the fixed corner home")
+    moves = Move.parse(moves)
+    if not isinstance(moves, list):
+        moves = [moves]
+
+    symmetry: int = transform // 24
+    perm: np.ndarray = _PERMS[transform]
+    solution: list[Move] = []
+
+    for move in moves:
+        turned = perm[MOVE_PERMS[move.value]]
+        for base in MOVE_LIST:
+            transform = _TRANSFORM_OF.get((symmetry, _INVERSE_MOVES[base.value][turned].tobytes()))
+            if transform is not None:
+                break
+        else:
+            raise ValueError(f"No move maps {move} back through the transform")
+        solution.append(base)
+        perm = _PERMS[transform]
+
+    return solution
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import BinaryIO, Callable
+import os
+import zlib
+
+from .constants import MOVES, NUM_STATES
+from .cube import Cube
+from .metrics import Metric, QTM, COMPOSITIONS
+from .moves import Move
+
+import numpy as np
+
+
+__all__ = ['CACHE_DIR', 'UNKNOWN', 'NO_MOVE', 'write_atomic', 'transition_table', 'build_transition_table', 'move_index',
+           'distance_table', 'build_distance_table', 'move_table', 'build_move_table', 'optimal_move', 'optimal_moves']
+
+"""
+Generated tables over the encoded state space (see Cube.encode_state).
+
+Tables are written once as .npy files under CACHE_DIR and memory-mapped
+read-only on later loads, so every process on a host shares the same pages.
+Set the POCKET_CUBE_CACHE environment variable to move the cache.
+
+Every table is built for a metric (see pocket_cube.metrics), the quarter-turn
+metric by default, and the tables of each metric are cached in their own files.
+"""
+CACHE_DIR = os.environ.get("POCKET_CUBE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pocket_cube"))
+
+TRANSITIONS_FILE = "transitions.npy"
+DISTANCES_FILE = "distances.npy"
+MOVE_TABLE_FILE = "optimal_moves.npy"
+
+# distance of a state that has not been reached
+UNKNOWN = 255
+# optimal move of the solved state in the quarter-turn move table, Metric.no_move in general
+NO_MOVE = QTM.no_move
+
+
+def _move_table_size(metric: Metric) -> int:
+    # the move table packs 8 states in Metric.move_bits bytes, and ends with the CRC-32 of the packed bytes
+    return NUM_STATES // 8 * metric.move_bits
+
+
+def _table_path(name: str, cache_dir: str | None, metric: Metric = QTM) -> str:
+    # the quarter-turn tables keep the names they had before there were metrics
+    if metric is not QTM:
+        (stem, extension) = os.path.splitext(name)
+        name = f"{stem}_{metric.name}{extension}"
+    return os.path.join(cache_dir or CACHE_DIR, name)
+
+
+def write_atomic(path: str, write: Callable[[BinaryIO], object]):
+    """
+    Writes the file with write(f) next to its final path and renames it, so concurrent
+    readers never see a partial file, and a crash never leaves one.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _save_table(table: np.ndarray, path: str):
+    write_atomic(path, lambda f: np.save(f, table))
+
+
+def _load_table(path: str, shape: tuple[int, ...], dtype: np.dtype) -> np.ndarray | None:
+    try:
+        table = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    if table.shape != shape or table.dtype != dtype:
+        return None
+
+    # still backed by the mapping, without the per-access overhead of the np.memmap subclass
+    return table.view(np.ndarray)
+
+
+def build_transition_table(metric: Metric = QTM, quarter_turns: np.ndarray | None = None) -> np.ndarray:
+    """
+    Builds the (NUM_STATES, len(metric.moves)) table of the rank reached by applying each move to each rank.
+
+    A quarter turn permutes the corners and twists them depending only on the
+    slots they land in, so the quarter-turn table is built from a 5040 x 6
+    permutation table and a 729 x 6 orientation table instead of decoding every
+    state. The columns of the other moves are composed from the quarter-turn
+    columns, following COMPOSITIONS.
+
+    Args:
+        metric (Metric, optional): The metric. Defaults to QTM.
+        quarter_turns (np.ndarray | None, optional): The quarter-turn table, if already built. Defaults to None.
+
+    Returns:
+        np.ndarray: The int32 transition table, indexed by [rank, Move.value].
+    """
+    if quarter_turns is None:
+        quarter_turns = _build_quarter_turn_table()
+    if metric.moves == QTM.moves:
+        return quarter_turns
+
+    columns = []
+    for move in metric.moves:
+        column = quarter_turns[:, COMPOSITIONS[move][0].value]
+        for quarter_turn in COMPOSITIONS[move][1:]:
+            column = quarter_turns[column, quarter_turn.value]
+        columns.append(column)
+    return np.stack(columns, axis=1).astype(np.int32)
+
+
+def _build_quarter_turn_table() -> np.ndarray:
+    perm_states = Cube.decode_states(np.arange(5040) * 729)
+    perm_table = Cube.encode_states(perm_states[:, MOVES].reshape(-1, 24)).reshape(5040, len(MOVES)) // 729
+
+    orientation_states = Cube.decode_states(np.arange(729))
+    orientation_table = Cube.encode_states(orientation_states[:, MOVES].reshape(-1, 24)).reshape(729, len(MOVES)) % 729
+
+    table = perm_table[:, None, :] * 729 + orientation_table[None, :, :]
+    return table.reshape(NUM_STATES, len(MOVES)).astype(np.int32)
+
+
+@lru_cache(maxsize=None)
+def transition_table(cache_dir: str | None = None, metric: Metric = QTM) -> np.ndarray:
+    """
+    Returns the transition table, building and caching it on disk on first use.
+    The table of a metric other than QTM is composed from the quarter-turn table.
+
+    Args:
+        cache_dir (str | None, optional): The cache directory. Defaults to CACHE_DIR.
+        metric (Metric, optional): The metric. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The read-only, memory-mapped int32 table, indexed by [rank, Move.value].
+    """
+    path = _table_path(TRANSITIONS_FILE, cache_dir, metric)
+    shape = (NUM_STATES, len(metric.moves))
+    table = _load_table(path, shape, np.dtype(np.int32))
+
+    if table is None:
+        quarter_turns = None if metric is QTM else transition_table(cache_dir)
+        _save_table(build_transition_table(metric, quarter_turns), path)
+        table = _load_table(path, shape, np.dtype(np.int32))
+
+    return table
+
+
+def move_index(rank: int, move: Move, metric: Metric = QTM) -> int:
+    """
+    Returns the rank reached by applying the move to the given rank.
+
+    Args:
+        rank (int): The rank of the state.
+        move (Move): The move to apply, one of the moves of the metric.
+        metric (Metric, optional): The metric of the transition table to read. Defaults to QTM.
+
+    Returns:
+        int: The rank of the resulting state.
+    """
+    return int(transition_table(metric=metric)[rank, move.value])
+
+
+def build_distance_table(transitions: np.ndarray | None = None, metric: Metric = QTM) -> np.ndarray:
+    """
+    Builds the table of the optimal distance to the solved state of every state,
+    with a breadth-first search from the solved state, one whole layer at a time.
+
+    Args:
+        transitions (np.ndarray | None, optional): The transition table of the metric.
+            Defaults to transition_table(metric=metric).
+        metric (Metric, optional): The metric. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The uint8 distance table, indexed by rank.
+    """
+    if transitions is None:
+        transitions = transition_table(metric=metric)
+
+    distances = np.full(NUM_STATES, UNKNOWN, dtype=np.uint8)
+    distances[0] = 0
+    frontier = np.zeros(1, dtype=np.int32)
+    depth: int = 0
+
+    while len(frontier):
+        depth += 1
+        neighbors = transitions[frontier].ravel()
+        distances[neighbors[distances[neighbors] == UNKNOWN]] = depth
+        frontier = np.flatnonzero(distances == depth)
+
+    assert distances.max() == metric.gods_number and not (distances == UNKNOWN).any(), \
+        "the distance table does not cover the whole state space"
+
+    return distances
+
+
+@lru_cache(maxsize=None)
+def distance_table(cache_dir: str | None = None, metric: Metric = QTM) -> np.ndarray:
+    """
+    Returns the distance table, building and caching it on disk on first use.
+
+    Args:
+        cache_dir (str | None, optional): The cache directory. Defaults to CACHE_DIR.
+        metric (Metric, optional): The metric. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The read-only, memory-mapped uint8 table, indexed by rank.
+    """
+    path = _table_path(DISTANCES_FILE, cache_dir, metric)
+    table = _load_table(path, (NUM_STATES,), np.dtype(np.uint8))
+
+    if table is None:
+        _save_table(build_distance_table(transition_table(cache_dir, metric), metric), path)
+        table = _load_table(path, (NUM_STATES,), np.dtype(np.uint8))
+
+    return table
+
+
+def build_move_table(transitions: np.ndarray | None = None, distances: np.ndarray | None = None,
+                     metric: Metric = QTM) -> np.ndarray:
+    """
+    Builds the packed table of one optimal move of every state: the first move
+    that leads to a state one step closer to the solved state.
+
+    Args:
+        transitions (np.ndarray | None, optional): The transition table. Defaults to transition_table(metric=metric).
+        distances (np.ndarray | None, optional): The distance table. Defaults to distance_table(metric=metric).
+        metric (Metric, optional): The metric. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The uint8 table, metric.move_bits bits per rank followed by a CRC-32, read with optimal_move.
+    """
+    if transitions is None:
+        transitions = transition_table(metric=metric)
+    if distances is None:
+        distances = distance_table(metric=metric)
+    bits: int = metric.move_bits
+
+    closer = distances[transitions] == distances[:, None].astype(np.int16) - 1
+    moves = closer.argmax(axis=1).astype(np.uint32)
+    moves[0] = metric.no_move
+
+    words = (moves.reshape(-1, 8) << (bits * np.arange(8, dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+    packed = words.view(np.uint8).reshape(-1, 4)[:, :bits].ravel()
+    checksum = np.frombuffer(zlib.crc32(packed).to_bytes(4, "little"), dtype=np.uint8)
+    return np.concatenate([packed, checksum])
+
+
+def _load_move_table(path: str, metric: Metric) -> np.ndarray | None:
+    size = _move_table_size(metric)
+    table = _load_table(path, (size + 4,), np.dtype(np.uint8))
+    if table is None or zlib.crc32(table[:size]) != int.from_bytes(table[size:], "little"):
+        return None
+    return table
+
+
+@lru_cache(maxsize=None)
+def move_table(cache_dir: str | None = None, metric: Metric = QTM) -> np.ndarray:
+    """
+    Returns the packed optimal move table, building and caching it on disk on first use.
+    A cached table whose checksum does not match is rebuilt.
+
+    Args:
+        cache_dir (str | None, optional): The cache directory. Defaults to CACHE_DIR.
+        metric (Metric, optional): The metric. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The read-only, memory-mapped packed table (about 1.4 MB in QTM, 1.8 MB in HTM),
+            read with optimal_move.
+    """
+    path = _table_path(MOVE_TABLE_FILE, cache_dir, metric)
+    table = _load_move_table(path, metric)
+
+    if table is None:
+        _save_table(build_move_table(transition_table(cache_dir, metric), distance_table(cache_dir, metric), metric), path)
+        table = _load_move_table(path, metric)
+
+    return table
+
+
+def optimal_move(rank: int, table: np.ndarray | None = None, metric: Metric = QTM) -> int:
+    """
+    Returns the value of an optimal move of the given rank.
+
+    Args:
+        rank (int): The rank of the state.
+        table (np.ndarray | None, optional): The packed move table of the metric. Defaults to move_table(metric=metric).
+        metric (Metric, optional): The metric. Defaults to QTM.
+
+    Returns:
+        int: The Move value, metric.no_move for the solved state.
+    """
+    if table is None:
+        table = move_table(metric=metric)
+    bits: int = metric.move_bits
+    start = bits * (rank >> 3)
+    return (int.from_bytes(table[start:start + bits], "little") >> (bits * (rank & 7))) & metric.no_move
+
+
+def optimal_moves(ranks: np.ndarray, table: np.ndarray | None = None, metric: Metric = QTM) -> np.ndarray:
+    """
+    Returns the value of an optimal move of each of the given ranks.
+
+    Args:
+        ranks (np.ndarray): The ranks of the states.
+        table (np.ndarray | None, optional): The packed move table of the metric. Defaults to move_table(metric=metric).
+        metric (Metric, optional): The metric. Defaults to QTM.
+
+    Returns:
+        np.ndarray: The uint8 Move values, metric.no_move for the solved state.
+    """
+    if table is None:
+        table = move_table(metric=metric)
+    bits: int = metric.move_bits
+    ranks = np.asarray(ranks, dtype=np.int64)
+    start = bits * (ranks >> 3)
+    words = np.zeros(len(ranks), dtype=np.uint32)
+    for byte in range(bits):
+        words |= table[start + byte].astype(np.uint32) << (8 * byte)
+    return ((words >> (bits * (ranks & 7)).astype(np.uint32)) & metric.no_move).astype(np.uint8)
@@ -0,0 +1,286 @@
+from pocket_cube.cube import Move
+from pocket_cube.metrics import Metric, METRICS, QTM
+from pocket_cube.sequence import compile_sequence
+from parallel import solve_optimal, attach_tables, solve_chunk
+from solvers import Solver, bidirectional_bfs, solve_by_table
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import asyncio
+import json
+import os
+import time
+import numpy as np
+
+"""
+Local HTTP solve service.
+
+    POST /solve            body: a scramble in the Move.parse string format, e.g. "R U F'"
+    GET  /solve?scramble=  the same, in the query string
+    GET  /metrics          QPS, latency percentiles and counters as JSON
+
+A solve answers 200 with the solution as a move string (empty if already solved),
+400 for a scramble that does not parse, 503 when the queue is full and 504 when the
+deadline passes first. The deadline defaults to --deadline-ms and can be set per request
+with the deadline_ms query parameter or the X-Deadline-Ms header.
+
+Requests are queued, gathered into micro-batches and solved on a process pool, with at
+most one batch in flight per worker, so a full queue means the workers are saturated.
+Solutions are in the metric of --metric, quarter turns by default.
+"""
+
+# solvers the service can run, by name, all picklable for the process pool and taking a metric
+SOLVERS: dict[str, Solver] = {
+    "ida_star": solve_optimal,
+    "bidirectional_bfs": bidirectional_bfs,
+    "move_table": solve_by_table,
+}
+
+REASONS: dict[int, str] = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                           500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+# completed requests kept for the latency percentiles, and the window of the QPS
+LATENCY_WINDOW: int = 10000
+QPS_WINDOW_S: float = 10.0
+
+@dataclass
+class SolveRequest:
+    scramble: str
+    deadline: float
+    future: asyncio.Future = field(repr=False)
+
+class Metrics:
+    def __init__(self):
+        self.started: float = time.monotonic()
+        self.accepted: int = 0
+        self.rejected: int = 0
+        self.timed_out: int = 0
+        self.failed: int = 0
+        self.batches: int = 0
+        self.batched: int = 0
+        # (completion time, latency in seconds) of the last completed requests
+        self.completed: deque[tuple[float, float]] = deque(maxlen=LATENCY_WINDOW)
+        self.total_completed: int = 0
+
+    def complete(self, latency: float):
+        self.completed.append((time.monotonic(), latency))
+        self.total_completed += 1
+
+    def snapshot(self, queue_depth: int) -> dict:
+        now: float = time.monotonic()
+        window: float = min(QPS_WINDOW_S, now - self.started)
+        recent: int = sum(1 for (done, _) in self.completed if done >= now - QPS_WINDOW_S)
+        latencies: np.ndarray = np.array([latency for (_, latency) in self.completed]) * 1000
+        percentiles: dict[str, float] = {}
+        if len(latencies):
+            percentiles = {f"p{p}_ms": float(np.percentile(latencies, p)) for p in (50, 90, 95, 99)}
+            percentiles["max_ms"] = float(latencies.max())
+        return {
+            "uptime_s": now - self.started,
+            "qps": recent / window if window > 0 else 0.0,
+            "accepted": self.accepted,
+            "completed": self.total_completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "queue_depth": queue_depth,
+            "batches": self.batches,
+            "mean_batch_size": self.batched / self.batches if self.batches else 0.0,
+            "latency": percentiles,
+        }
+
+class SolveServer:
+    """
+    Solves the queued scrambles in micro-batches: a batch starts with the oldest request and takes every
+    request that arrives within batch_window seconds, up to batch_size of them.
+    """
+
+    def __init__(self, solver: Solver = solve_optimal, workers: int | None = None, queue_size: int = 1024,
+                 batch_size: int = 32, batch_window: float = 0.002, deadline: float = 5.0, metric: Metric = QTM):
+        self.solver = solver if metric is QTM else partial(solver, metric=metric)
+        self.metric = metric
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.deadline = deadline
+        self.queue: asyncio.Queue[SolveRequest] = asyncio.Queue(maxsize=queue_size)
+        self.metrics = Metrics()
+        self.slots = asyncio.Semaphore(self.workers)
+        self.executor: Executor | None = None
+        self._batcher_task: asyncio.Task | None = None
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        attach_tables(self.metric)
+        self.executor = (ThreadPoolExecutor(max_workers=1) if self.workers == 1 else
+                         ProcessPoolExecutor(max_workers=self.workers, initializer=attach_tables, initargs=(self.metric,)))
+        # kept, the event loop only holds a weak reference to its tasks
+        self._batcher_task = asyncio.get_running_loop().create_task(self._batcher())
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def close(self):
+        if self._batcher_task is not None:
+            self._batcher_task.cancel()
+            try:
+                await self._batcher_task
+            except asyncio.CancelledError:
+                pass
+            self._batcher_task = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            batch: list[SolveRequest] = [await self.queue.get()]
+            closing: float = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), max(closing - loop.time(), 0)))
+                except asyncio.TimeoutError:
+                    break
+
+            # the requests that already gave up are not worth solving
+            now: float = time.monotonic()
+            batch = [request for request in batch if not request.future.done() and request.deadline > now]
+            if not batch:
+                self.slots.release()
+                continue
+            self.metrics.batches += 1
+            self.metrics.batched += len(batch)
+            chunk = [(idx, request.scramble or []) for (idx, request) in enumerate(batch)]
+            loop.run_in_executor(self.executor, solve_chunk, self.solver, chunk).add_done_callback(
+                lambda done, batch=batch: self._deliver(batch, done))
+
+    def _deliver(self, batch: list[SolveRequest], done: asyncio.Future):
+        self.slots.release()
+        if done.exception() is not None:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(done.exception())
+            return
+        for (idx, path, _) in done.result():
+            if not batch[idx].future.done():
+                batch[idx].future.set_result(path)
+
+    async def solve(self, scramble: str, deadline: float) -> tuple[int, str]:
+        """
+        Queues the scramble and waits for its solution until the deadline.
+
+        Returns:
+            tuple[int, str]: The HTTP status and the response body.
+        """
+        start: float = time.monotonic()
+        scramble = " ".join(scramble.split())
+        try:
+            compile_sequence(scramble or [])
+        except (KeyError, ValueError):
+            return (400, f"invalid scramble: {scramble!r}\n")
+
+        request = SolveRequest(scramble, start + deadline, asyncio.get_running_loop().create_future())
+        try:
+            self.queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            return (503, "queue full\n")
+        self.metrics.accepted += 1
+
+        try:
+            path: list[Move] = await asyncio.wait_for(asyncio.shield(request.future), deadline)
+        except asyncio.TimeoutError:
+            request.future.cancel()
+            self.metrics.timed_out += 1
+            return (504, "deadline exceeded\n")
+        except Exception as e:
+            self.metrics.failed += 1
+            return (500, f"{type(e).__name__}: {e}\n")
+        self.metrics.complete(time.monotonic() - start)
+        return (200, " ".join(map(str, path)) + "\n")
+
+    async def _route(self, method: str, target: str, headers: dict[str, str], body: bytes) -> tuple[int, str, str]:
+        url = urlsplit(target)
+        query: dict[str, list[str]] = parse_qs(url.query)
+        if url.path == "/metrics":
+            return (200, "application/json", json.dumps(self.metrics.snapshot(self.queue.qsize())) + "\n")
+        if url.path != "/solve":
+            return (404, "text/plain", "not found\n")
+
+        if method == "POST":
+            scramble: str = body.decode(errors="replace")
+        elif method == "GET":
+            scramble = query.get("scramble", [""])[0]
+        else:
+            return (405, "text/plain", "method not allowed\n")
+        try:
+            deadline: float = float(query.get("deadline_ms", [headers.get("x-deadline-ms", "")])[0]) / 1000
+        except ValueError:
+            deadline = self.deadline
+        (status, text) = await self.solve(scramble, deadline)
+        return (status, "text/plain", text)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serves the HTTP/1.1 requests of a connection, which is kept alive unless the client asks to close it.
+        """
+        try:
+            while True:
+                request_line: bytes = await reader.readline()
+                if not request_line.strip():
+                    break
+                (method, target, _) = request_line.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()).strip():
+                    (name, _, value) = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body: bytes = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                (status, content_type, text) = await self._route(method, target, headers, body)
+                payload: bytes = text.encode()
+                close: bool = headers.get("connection", "").lower() == "close"
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                             f"Content-Length: {len(payload)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n"
+                             .encode("latin-1") + payload)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(host: str, port: int, **kwargs):
+    server = SolveServer(**kwargs)
+    tcp_server = await server.start(host, port)
+    print(f"serving on http://{host}:{port} with {server.workers} workers", flush=True)
+    try:
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        await server.close()
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Serve solves over HTTP on localhost.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--solver", default="ida_star", choices=list(SOLVERS))
+    parser.add_argument("--metric", default="qtm", choices=list(METRICS), help="moves of the solutions")
+    parser.add_argument("--workers", type=int, default=None, help="solver processes, defaults to the number of CPUs")
+    parser.add_argument("--queue-size", type=int, default=1024, help="queued requests before rejecting with 503")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batch-window-ms", type=float, default=2.0, help="time a batch waits to fill up")
+    parser.add_argument("--deadline-ms", type=float, default=5000.0, help="default deadline of a request")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, solver=SOLVERS[args.solver], workers=args.workers,
+                          queue_size=args.queue_size, batch_size=args.batch_size,
+                          batch_window=args.batch_window_ms / 1000, deadline=args.deadline_ms / 1000,
+                          metric=METRICS[args.metric]))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
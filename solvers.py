@@ -0,0 +1,318 @@
+from pocket_cube.cube import Cube, Move
+from pocket_cube.moves import MOVE_LIST
+from pocket_cube.metrics import Metric, QTM, MOVE_PERMS, MOVE_GETTERS
+from pocket_cube.tables import transition_table, move_table, optimal_move
+from utils import get_path, NodeStore
+from heuristics import IncrementalHeuristic, incremental
+from stats import SearchStats, phase, timed
+from heapq import heappush, heappop
+from typing import Callable
+import threading
+import numpy as np
+
+# a solver takes the cube and returns its solution and the number of states it expanded
+Solver = Callable[[Cube], tuple[list[Move], int]]
+
+FOUND: int = -1
+
+_local = threading.local()
+
+def _node_stores(count: int, metric: Metric = QTM) -> list[NodeStore]:
+    """
+    Returns count node stores reset for the metric, allocated once per thread and reused by every search.
+    """
+    stores: list[NodeStore] = getattr(_local, "stores", [])
+    while len(stores) < count:
+        stores.append(NodeStore())
+    _local.stores = stores
+    for store in stores[:count]:
+        store.reset(metric)
+    return stores[:count]
+
+def release_node_stores():
+    """
+    Drops the node stores of the calling thread, the next search allocating new ones. Used to measure
+    the memory of a search, which would otherwise not include the stores of an earlier one.
+    """
+    _local.stores = []
+
+def solve_by_table(cube: Cube, metric: Metric = QTM) -> tuple[list[Move], int]:
+    """
+    Finds an optimal solution without searching, by following the optimal move table
+    from the cube to the solved state, one lookup per move (at most God's number).
+
+    Args:
+        cube (Cube): The cube to solve.
+        metric (Metric, optional): The moves of the solution. Defaults to QTM.
+
+    Returns:
+        tuple[list[Move], int]: The solution and the number of looked up states.
+    """
+    transitions: np.ndarray = transition_table(metric=metric)
+    table: np.ndarray = move_table(metric=metric)
+    rank: int = cube.encode()
+    path: list[Move] = []
+    while rank:
+        move: int = optimal_move(rank, table, metric)
+        path.append(MOVE_LIST[move])
+        rank = int(transitions[rank, move])
+    return (path, len(path) + 1)
+
+def bidirectional_bfs(cube: Cube, stats: SearchStats | None = None, metric: Metric = QTM) -> tuple[list[Move], int]:
+    """
+    Finds an optimal solution by searching from the cube and from the solved state at the same time.
+    Each step expands every state of the smaller frontier at once, through the transition table,
+    and only the newly discovered states are checked against the other side.
+    Each side records its states in a NodeStore.
+
+    Args:
+        cube (Cube): The cube to solve.
+        stats (SearchStats | None, optional): Filled with the counters and the "expand", "meet" and "path" timings.
+        metric (Metric, optional): The moves of the solution. Defaults to QTM.
+
+    Returns:
+        tuple[list[Move], int]: The solution and the number of discovered states.
+    """
+    transitions: np.ndarray = transition_table(metric=metric)
+    start: int = cube.encode()
+    if start == 0:
+        if stats is not None:
+            stats.on_solution([])
+        return ([], 1)
+
+    stores: list[NodeStore] = _node_stores(2, metric)
+    stores[0].add(start, None, 0)
+    stores[1].add(0, None, 0)
+    frontiers: list[np.ndarray] = [np.array([start]), np.array([0])]
+    depths: list[int] = [0, 0]
+    expanded: int = 0
+    generated: int = 0
+
+    while True:
+        i: int = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        with phase(stats, "expand"):
+            # expand the whole layer
+            moves = np.tile(np.arange(len(metric.moves), dtype=np.uint8), len(frontiers[i]))
+            neighbors = transitions[frontiers[i]].ravel()
+            new = ~stores[i].contains_many(neighbors)
+            neighbors, first = np.unique(neighbors[new], return_index=True)
+            expanded += len(frontiers[i])
+            generated += len(new)
+
+            depths[i] += 1
+            stores[i].add_many(neighbors, moves[new][first], depths[i])
+            frontiers[i] = neighbors
+
+        with phase(stats, "meet"):
+            # the other side may have reached the new states at its last two depths, keep the closest one
+            met: np.ndarray = neighbors[stores[1 - i].contains_many(neighbors)]
+            if len(met):
+                met_cube_key: int = int(met[stores[1 - i].depths_array[met].argmin()])
+        if len(met):
+            break
+
+    with phase(stats, "path"):
+        path1: list[Move] = get_path(met_cube_key, stores[0])
+        path2: list[Move] = get_path(met_cube_key, stores[1])
+        path2.reverse()
+        path2 = list(map(Move.opposite, path2))
+    discovered: int = len(stores[0]) + len(stores[1])
+    if stats is not None:
+        stats.expanded += expanded
+        stats.generated += generated
+        stats.duplicates += generated - (discovered - 2)
+        stats.on_solution(path1 + path2)
+    return (path1 + path2, discovered)
+
+def a_star(cube: Cube, heuristic: Callable[[Cube], int], stats: SearchStats | None = None,
+           metric: Metric = QTM) -> tuple[list[Move], int]:
+    """
+    Finds a solution with A*, on encoded states through the transition table.
+    The frontier is a heap of (f, -g, rank, ...) tuples, so that ties on f go to the deepest state,
+    and an entry whose state was reached by a shorter path after it was pushed is skipped when popped.
+    The discovered states are kept in a NodeStore, read and written one byte at a time.
+    A heuristic with an incremental version (see heuristics.incremental) is updated from the parent's value,
+    and the stickers of a state are only built when it is popped.
+    The solution is optimal if the heuristic is admissible in the metric.
+
+    Args:
+        cube (Cube): The cube to solve.
+        heuristic (Callable[[Cube], int]): The heuristic.
+        stats (SearchStats | None, optional): Filled with the counters and the "heuristic" timing.
+        metric (Metric, optional): The moves of the solution. Defaults to QTM.
+
+    Returns:
+        tuple[list[Move], int]: The solution and the number of discovered states.
+    """
+    transitions: np.ndarray = transition_table(metric=metric)
+    inc: IncrementalHeuristic | None = incremental(heuristic)
+    heuristic = timed(stats, "heuristic", heuristic)
+    probe: Cube = Cube.from_state(cube.state)
+    start: int = cube.encode()
+    (discovered,) = _node_stores(1, metric)
+    discovered.add(start, None, 0)
+    # the store's own arrays, to save a call per edge
+    (visited, moves, depths) = (discovered.visited, discovered.moves, discovered.depths)
+    # (f, -g, rank, stickers, move, partial): the stickers are those of the parent when move is not -1,
+    # and partial is the partial value of the incremental heuristic, if any
+    if inc is None:
+        frontier: list[tuple] = [(heuristic(cube), 0, start, cube.state, -1, None)]
+    else:
+        inc = inc.timed(stats)
+        (child, value) = (inc.child, inc.value)
+        root_partial = inc.partial(cube.state.tolist())
+        frontier = [(value(root_partial), 0, start, tuple(cube.state.tolist()), -1, root_partial)]
+    pushes, pops, expanded, generated, duplicates = 1, 0, 0, 0, 0
+    found: bool = False
+
+    while frontier:
+        (_, g, rank, state, last, partial) = heappop(frontier)
+        pops += 1
+        g = -g
+        if g > depths[rank]:
+            continue
+        if rank == 0:
+            found = True
+            break
+        if last != -1:
+            state = MOVE_GETTERS[last](state)
+
+        expanded += 1
+        score: int = g + 1
+        for move, neighbor in enumerate(transitions[rank].tolist()):
+            generated += 1
+            if visited[neighbor >> 3] >> (neighbor & 7) & 1:
+                if depths[neighbor] <= score:
+                    duplicates += 1
+                    continue
+            else:
+                visited[neighbor >> 3] |= 1 << (neighbor & 7)
+                discovered.count += 1
+            moves[neighbor] = move
+            depths[neighbor] = score
+            # the same state is never pushed twice with the same g, so the stickers are never compared
+            if inc is None:
+                probe.state = state[MOVE_PERMS[move]]
+                heappush(frontier, (score + heuristic(probe), -score, neighbor, probe.state, -1, None))
+            else:
+                child_partial = child(partial, state, move)
+                heappush(frontier, (score + value(child_partial), -score, neighbor, state, move, child_partial))
+            pushes += 1
+
+    path: list[Move] = get_path(0, discovered) if found else []
+    if stats is not None:
+        stats.expanded += expanded
+        stats.generated += generated
+        stats.pushes += pushes
+        stats.pops += pops
+        stats.duplicates += duplicates
+        stats.on_solution(path)
+    return (path, len(discovered))
+
+def ida_star(cube: Cube, heuristic: Callable[[Cube], int], stats: SearchStats | None = None,
+             metric: Metric = QTM) -> tuple[list[Move], int]:
+    """
+    Finds a solution with iterative deepening A*, which only keeps the current path in memory.
+    Successors that make the last moves of the path equivalent to fewer moves are pruned (see Metric),
+    such as undoing the previous move.
+    The path is walked on encoded states through the transition table, and the stickers needed by the
+    heuristic live in a preallocated array reused by every node.
+    A heuristic with an incremental version (see heuristics.incremental) is updated from the parent's value
+    instead, and the stickers of a child are only built if its f is within the bound.
+    The solution is optimal if the heuristic is admissible in the metric.
+
+    Args:
+        cube (Cube): The cube to solve.
+        heuristic (Callable[[Cube], int]): The heuristic.
+        stats (SearchStats | None, optional): Filled with the counters and the "heuristic" timing.
+        metric (Metric, optional): The moves of the solution. Defaults to QTM.
+
+    Returns:
+        tuple[list[Move], int]: The solution and the number of expanded states.
+    """
+    transitions: np.ndarray = transition_table(metric=metric)
+    successors: list[list[list[int]]] = metric.successors
+    inc: IncrementalHeuristic | None = incremental(heuristic)
+    heuristic = timed(stats, "heuristic", heuristic)
+    probe: Cube = Cube.from_state(cube.state)
+    path: list[int] = []
+    expanded: int = 0
+    generated: int = 0
+
+    def search(states: np.ndarray, code: int, g: int, bound: float) -> float:
+        nonlocal expanded, generated
+        probe.state = states[g]
+        f: float = g + heuristic(probe)
+        if f > bound:
+            return f
+        if code == 0:
+            return FOUND
+
+        expanded += 1
+        minimum: float = float('inf')
+        neighbors: list[int] = transitions[code].tolist()
+
+        for move in successors[path[-2] if len(path) > 1 else -1][path[-1] if path else -1]:
+            neighbor: int = neighbors[move]
+            generated += 1
+            np.take(states[g], MOVE_PERMS[move], out=states[g + 1])
+            path.append(move)
+            t: float = search(states, neighbor, g + 1, bound)
+            if t == FOUND:
+                return FOUND
+            path.pop()
+            minimum = min(minimum, t)
+        return minimum
+
+    def search_incremental(state: tuple[int, ...], partial, code: int, g: int, bound: float) -> float:
+        # the caller already checked the bound
+        nonlocal expanded, generated
+        if code == 0:
+            return FOUND
+
+        expanded += 1
+        minimum: float = float('inf')
+        neighbors: list[int] = transitions[code].tolist()
+
+        for move in successors[path[-2] if len(path) > 1 else -1][path[-1] if path else -1]:
+            neighbor: int = neighbors[move]
+            generated += 1
+            child_partial = child(partial, state, move)
+            f: float = g + 1 + value(child_partial)
+            if f > bound:
+                minimum = min(minimum, f)
+                continue
+            path.append(move)
+            t: float = search_incremental(MOVE_GETTERS[move](state), child_partial, neighbor, g + 1, bound)
+            if t == FOUND:
+                return FOUND
+            path.pop()
+            minimum = min(minimum, t)
+        return minimum
+
+    code: int = cube.encode()
+    if inc is None:
+        bound: float = heuristic(cube)
+    else:
+        inc = inc.timed(stats)
+        (child, value) = (inc.child, inc.value)
+        root: tuple[int, ...] = tuple(cube.state.tolist())
+        root_partial = inc.partial(root)
+        bound = value(root_partial)
+    while True:
+        if inc is None:
+            states: np.ndarray = np.empty((int(bound) + 2, 24), dtype=cube.state.dtype)
+            states[0] = cube.state
+            t: float = search(states, code, 0, bound)
+        else:
+            t = search_incremental(root, root_partial, code, 0, bound)
+        if t == FOUND or t == float('inf'):
+            break
+        bound = t
+
+    solution: list[Move] = [MOVE_LIST[move] for move in path]
+    if stats is not None:
+        stats.expanded += expanded
+        stats.generated += generated
+        stats.on_solution(solution)
+    return (solution, expanded)
@@ -0,0 +1,82 @@
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, fields
+from typing import Callable, ContextManager, Iterator
+import time
+
+@dataclass
+class SearchStats:
+    """
+    Counters and cumulative phase timings of a search, filled by the solvers that take a stats argument.
+    The solvers count in local variables and only touch the object when the search ends, the timings are
+    taken by wrapping the timed functions, and the per-iteration loops skip the phase contexts when stats
+    is None, so passing no stats costs at most a no-op context per search layer.
+
+    A subclass can override on_solution, which the solvers call with the solution once it is found.
+    """
+    expanded: int = 0
+    generated: int = 0
+    pushes: int = 0
+    pops: int = 0
+    duplicates: int = 0
+    heuristic_calls: int = 0
+    rollout_steps: int = 0
+    # nanoseconds spent in each phase
+    timings: dict[str, int] = field(default_factory=dict)
+
+    def add_time(self, name: str, ns: int):
+        self.timings[name] = self.timings.get(name, 0) + ns
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start: int = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter_ns() - start)
+
+    def timed(self, name: str, function: Callable) -> Callable:
+        """
+        Returns the function, timed under the given phase. A function timed as "heuristic" is also counted.
+        """
+        count: bool = name == "heuristic"
+
+        def wrapper(*args, **kwargs):
+            start: int = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.timings[name] = self.timings.get(name, 0) + time.perf_counter_ns() - start
+                if count:
+                    self.heuristic_calls += 1
+        return wrapper
+
+    def on_solution(self, path: list):
+        pass
+
+    def __iadd__(self, other: "SearchStats") -> "SearchStats":
+        for counter in fields(self):
+            if counter.name != "timings":
+                setattr(self, counter.name, getattr(self, counter.name) + getattr(other, counter.name))
+        for (name, ns) in other.timings.items():
+            self.add_time(name, ns)
+        return self
+
+    def as_dict(self) -> dict[str, int]:
+        """
+        Returns the counters and the timings as a flat dictionary, the timings keyed as "<phase>_ns".
+        """
+        flat: dict[str, int] = {counter.name: getattr(self, counter.name) for counter in fields(self) if counter.name != "timings"}
+        flat.update((f"{name}_ns", ns) for (name, ns) in sorted(self.timings.items()))
+        return flat
+
+def phase(stats: SearchStats | None, name: str) -> ContextManager:
+    """
+    Times the enclosed block under the given phase, or does nothing if stats is None.
+    """
+    return nullcontext() if stats is None else stats.phase(name)
+
+def timed(stats: SearchStats | None, name: str, function: Callable) -> Callable:
+    """
+    Returns the function timed under the given phase, or the function itself if stats is None.
+    """
+    return function if stats is None else stats.timed(name, function)
@@ -1,8 +1,10 @@
 from typing import Callable
 import time
 from pocket_cube.cube import Cube, Move
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
+from pocket_cube.constants import NUM_STATES
+from pocket_cube.metrics import MOVE_PERMS
+from pocket_cube.sequence import compile_sequence
+from pocket_cube.symmetry import _ROTATIONS
 import numpy as np
 
 case1 = "R U' R' F' U"
@@ -16,6 +18,9 @@ test_list: list[list[Move]] = list(
         [case1, case2, case3, case4])
     )
 
+# scrambles in the full notation, with L, D or B before other moves
+notation_cases = ["R U2 L U", "R U F' L F'", "F R' U2 R L U", "D F B2 R D' U L'", "B' U L2 F D R"]
+
 TestCase = tuple[bool, float, int, int]
 
 def is_solved(cube: Cube) -> bool:
@@ -48,8 +53,7 @@ def test(algorithm: Callable[[Cube], tuple[list[Move], int]], tests: list[list[M
         start = time.time()
         (path, states) = algorithm(cube)
         end = time.time()
-        for move in path:
-            cube = cube.move(move)
+        cube.state = compile_sequence(path).apply(cube.state)
         if not is_solved(cube):
             if log:
                 print(f"Test {idx} failed. Time: {end - start} seconds. States expanded: {states}. Path length: {len(path)}")
@@ -60,6 +64,98 @@ def test(algorithm: Callable[[Cube], tuple[list[Move], int]], tests: list[list[M
         res.append((success, end - start, states, len(path)))
     return res
 
+def test_batch_heuristics(heuristics: list[tuple[Callable[[Cube], int], Callable[[np.ndarray], np.ndarray]]], samples: int = 1000, seed: int = 0, log: bool = True) -> bool:
+    """
+    Checks that the batch version of each heuristic agrees with its scalar version on random states.
+
+    Args:
+        heuristics (list[tuple[Callable[[Cube], int], Callable[[np.ndarray], np.ndarray]]]): The (scalar, batch) pairs to check.
+        samples (int, optional): The number of random states. Defaults to 1000.
+        seed (int, optional): The seed of the random states. Defaults to 0.
+
+    Returns:
+        bool: True if every pair agrees on every state, False otherwise.
+    """
+    rng = np.random.default_rng(seed)
+    states: np.ndarray = Cube.decode_states(rng.integers(NUM_STATES, size=samples))
+    success: bool = True
+    for (scalar, batch) in heuristics:
+        expected = np.array([scalar(Cube.from_state(state)) for state in states])
+        agrees: bool = np.array_equal(batch(states), expected)
+        if log:
+            print(f"{scalar.__name__}: batch {'agrees' if agrees else 'disagrees'} with scalar on {samples} states.")
+        success = success and agrees
+    return success
+
+def _opposite_turn(perm: np.ndarray) -> np.ndarray:
+    # the turn of the opposite face is the turn that the cube turned as a whole makes of it, and moves none of its stickers
+    moved = perm != np.arange(24)
+    for rotation in _ROTATIONS:
+        turn = rotation[perm][np.argsort(rotation)]
+        if not (moved & (turn != np.arange(24))).any():
+            return turn
+
+def test_notation(algorithm: Callable[[Cube], tuple[list[Move], int]], scrambles: list[str] = notation_cases, log: bool = True) -> bool:
+    """
+    Checks that the solution of a scramble in the full notation solves the cube scrambled by actually turning L, D and B,
+    once that cube is turned as a whole to bring the corner that R, F and U never move back home.
+
+    Args:
+        algorithm (Callable[[Cube], tuple[list[Move], int]]): The algorithm to test.
+        scrambles (list[str], optional): The scrambles. Defaults to notation_cases.
+
+    Returns:
+        bool: True if every solution solves its scramble, False otherwise.
+    """
+    turns: dict[str, np.ndarray] = {'R': MOVE_PERMS[Move.R.value], 'F': MOVE_PERMS[Move.F.value], 'U': MOVE_PERMS[Move.U.value]}
+    turns.update({'L': _opposite_turn(turns['R']), 'B': _opposite_turn(turns['F']), 'D': _opposite_turn(turns['U'])})
+    fixed: np.ndarray = np.flatnonzero((MOVE_PERMS == np.arange(24)).all(axis=0))
+    goal: np.ndarray = Cube(scrambled=False).goal_state
+    success: bool = True
+    for scramble in scrambles:
+        state: np.ndarray = goal.copy()
+        for move in scramble.split(" "):
+            for _ in range({"": 1, "2": 2, "'": 3}[move[1:]]):
+                state = state[turns[move[0]]]
+        # the rotation that brings the fixed corner back home
+        state = next(state[rotation] for rotation in _ROTATIONS if np.array_equal(state[rotation][fixed], goal[fixed]))
+        (path, _) = algorithm(Cube(scramble))
+        solved: bool = np.array_equal(compile_sequence(path).apply(state), goal)
+        if log:
+            print(f"{scramble}: {' '.join(map(str, path))} {'solves' if solved else 'does not solve'} it.")
+        success = success and solved
+    return success
+
+def test_solution_cache(budget: int = 1, log: bool = True) -> bool:
+    """
+    Checks that SolutionCache only caches real solutions: play_mcts on a small budget fails on a deep scramble,
+    which must be searched again on the next call, while the empty solution of the solved state is cached.
+
+    Args:
+        budget (int, optional): The MCTS budget, small enough for the search to fail. Defaults to 1.
+
+    Returns:
+        bool: True if the cache holds exactly the solved scrambles, False otherwise.
+    """
+    # imported here, heuristics (which mcts imports) imports tests
+    from cache import SolutionCache
+    from heuristics import hamming
+    from mcts import play_mcts
+
+    success: bool = True
+    for canonical in (False, True):
+        cache = SolutionCache(lambda cube: play_mcts(cube, budget, 0.5, hamming), canonical=canonical)
+        for cube in [Cube(test_list[3]), Cube(test_list[3]), Cube(scrambled=False)]:
+            misses: int = cache.misses
+            (path, _) = cache(cube)
+            solved: bool = np.array_equal(compile_sequence(path).apply(cube.state), cube.goal_state)
+            # a failed search is never a hit, and only solutions are kept
+            passed: bool = (solved or cache.misses == misses + 1) and (cube in cache) == solved
+            if log:
+                print(f"canonical={canonical}: {'solved' if solved else 'failed'}, {'cached' if cube in cache else 'not cached'}.")
+            success = success and passed
+    return success
+
 def test_mcts(algorithm: Callable[[Cube, int, float, Callable[[Cube], int]], tuple[list[Move], int]], heuristic_list: list[Callable[[Cube], int]]) -> None:
     for c in [0.1, 0.5]:
         for budget in [1000, 5000, 10000, 20000]:
@@ -90,6 +186,9 @@ def test_mcts(algorithm: Callable[[Cube, int, float, Callable[[Cube], int]], tup
             draw_comparison_graph(test_results_for_compare[0], test_results_for_compare[1], heuristic_list[0].__name__, heuristic_list[1].__name__)
 
 def draw_graph(test_cases: list[TestCase]) -> None:
+    # imported here so that importing tests (and heuristics, which uses test_list) does not load matplotlib
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as ticker
     # time plot
     fig, ax = plt.subplots()
     ax.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
@@ -119,6 +218,9 @@ def draw_graph(test_cases: list[TestCase]) -> None:
     plt.show()
 
 def draw_comparison_graph(test_cases1: list[TestCase], test_cases2: list[TestCase], label1, label2) -> None:
+    # imported here so that importing tests (and heuristics, which uses test_list) does not load matplotlib
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as ticker
     # draw graph similar to the ones in draw_graph, but make it a comparison graph by using 2 columns per x value, one for each test case
     # time plot
     fig, ax = plt.subplots()
@@ -1,5 +1,11 @@
 from pocket_cube.cube import Cube, Move
+from pocket_cube.moves import MOVE_LIST
+from pocket_cube.constants import NUM_STATES
+from pocket_cube.metrics import Metric, QTM
+from pocket_cube.tables import transition_table
 from dataclasses import dataclass, field
+from typing import Union
+import numpy as np
 
 @dataclass(order=True)
 class FrontierItem:
@@ -10,31 +16,131 @@ class FrontierItem:
         self.priority = priority
         self.cube = cube
 
-DiscoveredDict = dict[str, tuple[str, Move, int]]
+# a cube is keyed either by Cube.encode() or by the legacy Cube.hash() string
+StateKey = Union[int, str]
+DiscoveredDict = dict[StateKey, tuple[StateKey, Move, int]]
 
-def get_neighbors(cube: Cube) -> list[tuple[Cube, Move]]:
+OPPOSITES: list[int] = [move.opposite().value for move in MOVE_LIST]
+
+class NodeStore:
+    """
+    Discovered states of a search, indexed by Cube.encode() rank instead of keyed in a dictionary:
+    a visited bitset, the move that reached each state (NO_MOVE for a start state) and its depth g,
+    a byte each. The parent is not stored, it is found by undoing the move in the transition table of the metric.
+    The arrays cover the whole state space (about 8 MB) and are allocated once, reset only clears
+    the bitset, so a store is meant to be reused across searches.
+
+    The bytearrays are fast to index one state at a time, and the *_array attributes are NumPy views
+    of them for whole layers of states.
+    """
+    # not a Move value in any metric
+    NO_MOVE: int = 255
+
+    def __init__(self, metric: Metric = QTM):
+        self.metric = metric
+        self.visited = bytearray(NUM_STATES // 8)
+        self.moves = bytearray(NUM_STATES)
+        self.depths = bytearray(NUM_STATES)
+        self.visited_array = np.frombuffer(self.visited, dtype=np.uint8)
+        self.moves_array = np.frombuffer(self.moves, dtype=np.uint8)
+        self.depths_array = np.frombuffer(self.depths, dtype=np.uint8)
+        self.count: int = 0
+
+    def reset(self, metric: Metric | None = None):
+        if metric is not None:
+            self.metric = metric
+        self.visited_array.fill(0)
+        self.count = 0
+
+    def add(self, rank: int, move: int | None, g: int):
+        """
+        Records the state, reached by the move value from its parent at depth g, or a start state if move is None.
+        """
+        if not self.visited[rank >> 3] >> (rank & 7) & 1:
+            self.visited[rank >> 3] |= 1 << (rank & 7)
+            self.count += 1
+        self.moves[rank] = self.NO_MOVE if move is None else move
+        self.depths[rank] = g
+
+    def add_many(self, ranks: np.ndarray, moves: np.ndarray, g: int):
+        """
+        Records distinct, not yet visited states, all at depth g.
+        """
+        np.bitwise_or.at(self.visited_array, ranks >> 3, (1 << (ranks & 7)).astype(np.uint8))
+        self.moves_array[ranks] = moves
+        self.depths_array[ranks] = g
+        self.count += len(ranks)
+
+    def contains_many(self, ranks: np.ndarray) -> np.ndarray:
+        return (self.visited_array[ranks >> 3] >> (ranks & 7).astype(np.uint8) & 1).astype(bool)
+
+    def g(self, rank: int) -> int:
+        return self.depths[rank]
+
+    def move(self, rank: int) -> Move | None:
+        move: int = self.moves[rank]
+        return None if move == self.NO_MOVE else MOVE_LIST[move]
+
+    def parent(self, rank: int) -> int | None:
+        move: int = self.moves[rank]
+        return None if move == self.NO_MOVE else int(transition_table(metric=self.metric)[rank, OPPOSITES[move]])
+
+    def path(self, rank: int) -> list[Move]:
+        """
+        Returns the moves from the start state to the state.
+        """
+        transitions = transition_table(metric=self.metric)
+        path: list[Move] = []
+        move: int = self.moves[rank]
+        while move != self.NO_MOVE:
+            path.append(MOVE_LIST[move])
+            rank = int(transitions[rank, OPPOSITES[move]])
+            move = self.moves[rank]
+        path.reverse()
+        return path
+
+    def ranks(self) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(self.visited_array, bitorder="little"))
+
+    def __contains__(self, rank: int) -> bool:
+        return bool(self.visited[rank >> 3] >> (rank & 7) & 1)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        return iter(self.ranks().tolist())
+
+def get_neighbors(cube: Cube | int, metric: Metric = QTM) -> list[tuple[Cube, Move]] | list[tuple[int, Move]]:
     """
     Returns the neighbors of the given cube.
+    If the cube is given by its Cube.encode() rank, the neighbors are ranks too,
+    read from the transition table without building any Cube.
 
     Args:
-        cube (Cube): The cube to get the neighbors of.
+        cube (Cube | int): The cube, or its rank, to get the neighbors of.
+        metric (Metric, optional): The moves to the neighbors. Defaults to QTM.
 
     Returns:
-        list[tuple[Cube, Move]]: The neighbors of the given cube.
+        list[tuple[Cube, Move]] | list[tuple[int, Move]]: The neighbors of the given cube.
     """
-    return [(cube.move(move), move) for move in Move]
+    if isinstance(cube, Cube):
+        return [(cube.move(move), move) for move in metric.moves]
+    return list(zip(transition_table(metric=metric)[cube].tolist(), metric.moves))
 
-def get_path(cube_hash: str, discovered: DiscoveredDict) -> list[Move]:
+def get_path(cube_hash: StateKey, discovered: DiscoveredDict | NodeStore) -> list[Move]:
     """
     Returns the path to the given cube.
 
     Args:
-        cube_hash (str): The hash of the cube to get the path to.
-        discovered (DiscoveredDict): The dictionary of discovered cubes.
+        cube_hash (StateKey): The key of the cube to get the path to.
+        discovered (DiscoveredDict | NodeStore): The discovered cubes.
 
     Returns:
         list[Move]: The path to the given cube.
     """
+    if isinstance(discovered, NodeStore):
+        return discovered.path(cube_hash)
     path: list[Move] = []
     currentNode = discovered[cube_hash]
     while currentNode[0] is not None:
@@ -43,17 +149,20 @@ def get_path(cube_hash: str, discovered: DiscoveredDict) -> list[Move]:
     path.reverse()
     return path
 
-def met_in_the_middle(cubes1: DiscoveredDict, cubes2: DiscoveredDict) -> str:
+def met_in_the_middle(cubes1: DiscoveredDict | NodeStore, cubes2: DiscoveredDict | NodeStore) -> StateKey:
     """
     Returns the hash of the cube that was discovered by both frontiers.
 
     Args:
-        cubes1 (DiscoveredDict): The dictionary of discovered cubes of the first frontier.
-        cubes2 (DiscoveredDict): The dictionary of discovered cubes of the second frontier.
+        cubes1 (DiscoveredDict | NodeStore): The discovered cubes of the first frontier.
+        cubes2 (DiscoveredDict | NodeStore): The discovered cubes of the second frontier.
 
     Returns:
-        str: The hash of the cube that was discovered by both frontiers.
+        StateKey: The key of the cube that was discovered by both frontiers.
     """
+    if isinstance(cubes1, NodeStore) and isinstance(cubes2, NodeStore):
+        both = np.flatnonzero(np.unpackbits(cubes1.visited_array & cubes2.visited_array, bitorder="little"))
+        return int(both[0]) if len(both) else None
     for key in cubes1:
         if key in cubes2:
             return key